@@ -0,0 +1,196 @@
+# ⏱️ Benchmark do app sem rede: sobe o Supabase falso (supabase_falso.py) com
+# históricos sintéticos, roda cuidados.py pelo AppTest do Streamlit e mede, para
+# cada aba, o tempo da primeira execução e dos reruns, as requisições HTTP e os
+# bytes recebidos por execução e a memória do processo do app (o RSS máximo
+# acumulado desde o início, não o de cada aba; o pico por aba vem do --tracemalloc).
+#
+#   python benchmark/benchmark.py                        # 1k, 100k e 1M registros
+#   python benchmark/benchmark.py --tamanhos 1000 --repeticoes 10 --saida resultados.json
+#
+# Cada tamanho roda num processo separado (o servidor em outro), então os caches
+# do processo (st.cache_resource) começam vazios e a memória medida é só do app.
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.request import urlopen
+
+PASTA = Path(__file__).resolve().parent
+APP = PASTA.parent / "cuidados.py"
+TAMANHOS_PADRAO = [1_000, 100_000, 1_000_000]
+
+def estatisticas_servidor(url, zerar=False):
+    with urlopen(f"{url}/_zerar" if zerar else f"{url}/_estatisticas") as resposta:
+        return json.loads(resposta.read())
+
+def memoria_acumulada_mb():
+    # RSS máximo do processo desde o início (não volta a cair entre abas);
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+def executar_medida(at, url, rastrear_memoria):
+    estatisticas_servidor(url, zerar=True)
+    if rastrear_memoria:
+        tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    at.run()
+    duracao = time.perf_counter() - inicio
+    estatisticas = estatisticas_servidor(url)
+    medida = {
+        "segundos": duracao,
+        "requisicoes": estatisticas["requisicoes"],
+        "bytes": estatisticas["bytes"],
+        "chamadas": estatisticas["por_caminho"],
+        "memoria_acumulada_mb": memoria_acumulada_mb(),
+        "erros": [e.message for e in at.exception] + [str(e.value) for e in at.error],
+    }
+    if rastrear_memoria:
+        medida["tracemalloc_pico_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    return medida
+
+def medir(url, repeticoes, rastrear_memoria):
+    # Roda dentro do processo filho: o app conversa só com o servidor falso
+    sys.path.insert(0, str(PASTA))
+    from supabase_falso import USUARIO, gerar_jwt
+    from streamlit.testing.v1 import AppTest
+
+    if rastrear_memoria:
+        tracemalloc.start()
+    at = AppTest.from_file(str(APP), default_timeout=900)
+    at.session_state["usuario"] = USUARIO
+    at.session_state["access_token"] = gerar_jwt()
+    at.session_state["refresh_token"] = "renovacao"
+
+    resultados = []
+    primeira = executar_medida(at, url, rastrear_memoria)
+    abas = at.radio(key="radio_aba").options if at.radio else []
+    for indice, aba in enumerate(abas):
+        if indice == 0:
+            fria = primeira
+        else:
+            at.radio(key="radio_aba").set_value(aba)
+            fria = executar_medida(at, url, rastrear_memoria)
+        quentes = [executar_medida(at, url, rastrear_memoria) for _ in range(repeticoes)]
+        resultados.append({"aba": aba, "primeira": fria, "reruns": quentes})
+    if not abas:
+        resultados.append({"aba": "(sem abas)", "primeira": primeira, "reruns": []})
+    return resultados
+
+def rodar_tamanho(registros, argumentos):
+    servidor = subprocess.Popen(
+        [sys.executable, str(PASTA / "supabase_falso.py"), "--registros", str(registros),
+         "--pacientes", str(argumentos.pacientes),
+         "--latencia-ms", str(argumentos.latencia_ms)],
+        stdout=subprocess.PIPE, text=True
+    )
+    try:
+        url = servidor.stdout.readline().strip()
+        if not url:
+            raise RuntimeError("o servidor falso não iniciou")
+        sys.path.insert(0, str(PASTA))
+        from supabase_falso import gerar_jwt
+
+        with tempfile.TemporaryDirectory() as pasta_temporaria:
+            ambiente = dict(
+                os.environ,
+                SUPABASE_URL=url,
+                SUPABASE_KEY=gerar_jwt(10 ** 8, role="anon"),
+                ESPELHO_DIRETORIO=str(Path(pasta_temporaria) / "espelho"),
+                CAIXA_SAIDA_ARQUIVO=str(Path(pasta_temporaria) / "caixa_saida.sqlite3"),
+                TEMPO_REAL="1" if argumentos.tempo_real else "0",
+            )
+            comando = [sys.executable, __file__, "--medir", url, "--repeticoes", str(argumentos.repeticoes)]
+            if argumentos.tracemalloc:
+                comando.append("--tracemalloc")
+            filho = subprocess.run(comando, env=ambiente, cwd=pasta_temporaria, capture_output=True, text=True)
+        if filho.returncode != 0:
+            raise RuntimeError(f"falha ao medir {registros} registros:\n{filho.stderr[-3000:]}")
+        # A última linha da saída do filho é o JSON com as medidas
+        return json.loads(filho.stdout.strip().splitlines()[-1])
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+def resumir(registros, resultados):
+    linhas = []
+    for resultado in resultados:
+        primeira, reruns = resultado["primeira"], resultado["reruns"]
+        tempos = [r["segundos"] for r in reruns] or [float("nan")]
+        linhas.append({
+            "registros": registros,
+            "aba": resultado["aba"],
+            "primeira_s": primeira["segundos"],
+            "rerun_mediana_s": statistics.median(tempos),
+            "rerun_max_s": max(tempos),
+            "primeira_requisicoes": primeira["requisicoes"],
+            "rerun_requisicoes": statistics.mean([r["requisicoes"] for r in reruns]) if reruns else 0,
+            "primeira_kb": primeira["bytes"] / 1024,
+            "rerun_kb": statistics.mean([r["bytes"] for r in reruns]) / 1024 if reruns else 0,
+            "memoria_acumulada_mb": max([primeira["memoria_acumulada_mb"]] + [r["memoria_acumulada_mb"] for r in reruns]),
+            # Pico de alocações da própria aba (só com --tracemalloc)
+            "pico_aba_mb": max(
+                [r["tracemalloc_pico_mb"] for r in [primeira] + reruns if "tracemalloc_pico_mb" in r], default=None
+            ),
+            "erros": sorted({erro for r in [primeira] + reruns for erro in r["erros"]}),
+        })
+    return linhas
+
+def imprimir(linhas):
+    cabecalho = (
+        f"{'registros':>10} {'aba':<22} {'1ª (s)':>8} {'rerun (s)':>10} {'máx (s)':>8} "
+        f"{'req 1ª':>7} {'req rerun':>9} {'KB 1ª':>10} {'KB rerun':>9} {'RSS acum. MB':>12} {'pico aba MB':>11}"
+    )
+    print(cabecalho)
+    print("-" * len(cabecalho))
+    for linha in linhas:
+        print(
+            f"{linha['registros']:>10} {linha['aba']:<22} {linha['primeira_s']:>8.3f} "
+            f"{linha['rerun_mediana_s']:>10.3f} {linha['rerun_max_s']:>8.3f} "
+            f"{linha['primeira_requisicoes']:>7} {linha['rerun_requisicoes']:>9.1f} "
+            f"{linha['primeira_kb']:>10.1f} {linha['rerun_kb']:>9.1f} {linha['memoria_acumulada_mb']:>12.0f} "
+            + (f"{linha['pico_aba_mb']:>11.1f}" if linha["pico_aba_mb"] is not None else f"{'—':>11}")
+        )
+        for erro in linha["erros"]:
+            print(f"{'':>10} ⚠️ {erro}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do cuidados.py")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO,
+                        help="quantidades de registros diários a gerar")
+    parser.add_argument("--repeticoes", type=int, default=5, help="reruns medidos por aba")
+    parser.add_argument("--pacientes", type=int, default=1,
+                        help="pacientes no banco falso, cada um com o histórico completo")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="atraso artificial por requisição")
+    parser.add_argument("--sem-tempo-real", dest="tempo_real", action="store_false",
+                        help="desliga a assinatura em tempo real (TEMPO_REAL=0)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="mede o pico de alocações de cada execução (deixa tudo mais lento)")
+    parser.add_argument("--saida", help="grava as medidas completas neste arquivo JSON")
+    parser.add_argument("--medir", metavar="URL", help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.medir:
+        print(json.dumps(medir(argumentos.medir, argumentos.repeticoes, argumentos.tracemalloc)))
+        return
+
+    completo = {}
+    linhas = []
+    for registros in argumentos.tamanhos:
+        print(f"▶ {registros} registros...", file=sys.stderr, flush=True)
+        resultados = rodar_tamanho(registros, argumentos)
+        completo[registros] = resultados
+        linhas.extend(resumir(registros, resultados))
+    imprimir(linhas)
+    if argumentos.saida:
+        Path(argumentos.saida).write_text(json.dumps(completo, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,597 @@
+# 🧪 Supabase falso para rodar o app sem rede: REST (PostgREST), autenticação
+# (GoTrue) e um websocket mínimo do Realtime, tudo num servidor HTTP local.
+# As tabelas ficam em DataFrames (strings do pyarrow) para caber 1M de registros
+# na memória. Cada resposta é contada em /_estatisticas, que o benchmark lê.
+import argparse
+import base64
+import hashlib
+import json
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+LATENCIA_SEGUNDOS = 0.0
+# Como o max-rows do PostgREST (1000 no Supabase): nenhuma resposta traz mais linhas que isso
+MAX_LINHAS = 1000
+USUARIO = {
+    "id": "00000000-0000-0000-0000-000000000001",
+    "aud": "authenticated",
+    "role": "authenticated",
+    "email": "benchmark@exemplo.com",
+    "app_metadata": {},
+    "user_metadata": {},
+    "created_at": "2024-01-01T00:00:00Z",
+}
+GUID_WEBSOCKET = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+def _base64(dados):
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).rstrip(b"=").decode()
+
+def gerar_jwt(validade_segundos=3600, role="authenticated"):
+    # Assinatura falsa: o app só lê o exp sem verificar a assinatura
+    cabecalho = {"alg": "HS256", "typ": "JWT"}
+    corpo = {"sub": USUARIO["id"], "email": USUARIO["email"], "role": role, "exp": int(time.time()) + validade_segundos}
+    return f"{_base64(cabecalho)}.{_base64(corpo)}.assinatura"
+
+# 🗃️ Dados sintéticos
+CUIDADORES = ["Ana", "Bia", "Carla", "Davi", "Eva", "Fábio", "Gil", "Helena", "Iris", "João"]
+OPCOES_SONO = [f"{h}h {m}min" if m > 0 else f"{h}h" for h in range(3, 13) for m in [0, 30]]
+OPCOES_FEZE = ["Normal (Fecaloma)", "Pastoso", "Diarreia"]
+OPCOES_URINA = ["Normal", "Escura", "Clara", "Com odor forte"]
+CAMPOS_TEXTO_FISIOTERAPIA = [
+    "exercicios", "treino_marcha", "equilibrio", "coordenacao", "exercicios_domiciliares",
+    "amplitude_movimento", "capacidade_funcional", "quadro_clinico", "observacoes_paciente",
+    "intercorrencias", "evolucao_tratamento", "metas_terapeuticas", "recomendacoes_familia",
+]
+
+def _texto(valores):
+    return pd.array(valores, dtype="string[pyarrow]")
+
+def _datas(n, gerador, inicio="2015-01-01"):
+    # n linhas espalhadas por ~3 registros por dia até hoje
+    dias = max(1, min(n // 3, (pd.Timestamp.today() - pd.Timestamp(inicio)).days))
+    deslocamento = np.sort(gerador.integers(0, dias, n))
+    return pd.Timestamp.today().normalize() - pd.to_timedelta(dias - deslocamento, unit="D")
+
+def gerar_paciente(registros, gerador):
+    n = registros
+    datas = _datas(n, gerador)
+    criado = (datas + pd.to_timedelta(gerador.integers(0, 86400, n), unit="s")).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+    tabelas = {}
+    tabelas["registros_diarios"] = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "data": _texto(datas.strftime("%Y-%m-%d")),
+        "temperatura": np.round(gerador.normal(36.6, 0.4, n), 1),
+        "saturacao": gerador.integers(88, 100, n),
+        "frequencia_cardiaca": gerador.integers(55, 110, n),
+        "pressao": _texto([f"{s}x{d}" for s, d in zip(gerador.integers(100, 150, n), gerador.integers(60, 95, n))]),
+        "sono": _texto(gerador.choice(OPCOES_SONO, n)),
+        "observacao": _texto(gerador.choice(["", "Sem intercorrências", "Dormiu bem", "Agitado à noite"], n)),
+        "cuidador": _texto(gerador.choice(CUIDADORES, n)),
+        "observacao_geral": _texto(np.full(n, "")),
+        "quantidade_feze": _texto(gerador.integers(0, 4, n).astype(str)),
+        "caracteristica_feze": _texto(gerador.choice(OPCOES_FEZE, n)),
+        "quantidade_urina": _texto(gerador.integers(0, 8, n).astype(str)),
+        "aspecto_urina": _texto(gerador.choice(OPCOES_URINA, n)),
+        "created_at": _texto(criado),
+    })
+    tabelas["cuidadores"] = pd.DataFrame({
+        "id": np.arange(1, len(CUIDADORES) + 1),
+        "nome": _texto(CUIDADORES),
+        "idade": gerador.integers(20, 60, len(CUIDADORES)),
+        "telefone": _texto([f"8499999{i:04d}" for i in range(len(CUIDADORES))]),
+        "especialidade": _texto(gerador.choice(["Geral", "Cuidador", "Enfermeiro"], len(CUIDADORES))),
+        "disponibilidade": gerador.integers(1, 7, len(CUIDADORES)),
+        "created_at": _texto(np.full(len(CUIDADORES), "2024-01-01T00:00:00+00:00")),
+    })
+    m = 20
+    tabelas["medicamentos"] = pd.DataFrame({
+        "id": np.arange(1, m + 1),
+        "nome": _texto([f"Medicamento {i}" for i in range(1, m + 1)]),
+        "dosagem": _texto(gerador.choice(["5mg", "10mg", "500mg"], m)),
+        "frequencia": _texto(gerador.choice(["1x ao dia", "2x ao dia", "A cada 8h"], m)),
+        "horario": _texto(gerador.choice(["08:00", "12:00", "20:00"], m)),
+        "cuidador_id": gerador.integers(1, len(CUIDADORES) + 1, m),
+        "observacoes": _texto(np.full(m, "")),
+        "created_at": _texto(np.full(m, "2024-01-01T00:00:00+00:00")),
+    })
+    a = max(10, n // 10)
+    datas_a = _datas(a, gerador)
+    tabelas["alimentacao"] = pd.DataFrame({
+        "id": np.arange(1, a + 1),
+        "refeicao": _texto(gerador.choice(["Café da Manhã", "Almoço", "Lanche", "Jantar"], a)),
+        "alimentos": _texto(gerador.choice(["Arroz e feijão", "Sopa", "Frutas", "Mingau"], a)),
+        "quantidade": _texto(gerador.choice(["Pouco", "Normal", "Muito"], a)),
+        "aceitou": _texto(gerador.choice(["Sim", "Parcialmente", "Recusou"], a)),
+        "horario": _texto(gerador.choice(["08:00", "12:00", "15:00", "19:00"], a)),
+        "responsavel": _texto(gerador.choice(CUIDADORES, a)),
+        "cuidador_id": gerador.integers(1, len(CUIDADORES) + 1, a),
+        "observacoes": _texto(np.full(a, "")),
+        "created_at": _texto(datas_a.strftime("%Y-%m-%dT12:00:00+00:00")),
+    })
+    f = max(10, n // 100)
+    datas_f = _datas(f, gerador)
+    fisioterapia = {
+        "id": np.arange(1, f + 1),
+        "data_sessao": _texto(datas_f.strftime("%Y-%m-%d")),
+        "fisioterapeuta": _texto(gerador.choice(CUIDADORES, f)),
+        "grau_dor": gerador.integers(0, 10, f),
+        "forca_muscular": _texto(np.full(f, "Grau 3 - Movimento contra gravidade")),
+        "espasticidade": _texto(gerador.choice(["Normal", "Leve", "Moderada"], f)),
+        "estabilidade_motora": _texto(gerador.choice(["Estável", "Melhora"], f)),
+        "cuidador_id": gerador.integers(1, len(CUIDADORES) + 1, f),
+        "created_at": _texto(datas_f.strftime("%Y-%m-%dT10:00:00+00:00")),
+    }
+    for campo in CAMPOS_TEXTO_FISIOTERAPIA:
+        fisioterapia[campo] = _texto(np.full(f, f"Anotação de {campo}. " * 25))
+    tabelas["fisioterapia"] = pd.DataFrame(fisioterapia)
+    tabelas["fisioterapia"]["previa"] = _previa_fisioterapia(tabelas["fisioterapia"])
+
+    # Administrações seguindo a agenda de cada medicamento, com atrasos e ~8% de doses esquecidas
+    horas = {"1x ao dia": [0], "2x ao dia": [0, 12], "A cada 8h": [0, 8, 16]}
+    agenda = tabelas["medicamentos"][["id", "frequencia", "horario"]].copy()
+    agenda["hora"] = agenda["frequencia"].astype(str).map(horas)
+    agenda = agenda.explode("hora")
+    dias = pd.DataFrame({"dia": pd.date_range(datas.min(), pd.Timestamp.today().normalize(), freq="D")})
+    doses = agenda.merge(dias, how="cross")
+    prevista = (
+        doses["dia"] + pd.to_timedelta(doses["horario"].astype(str) + ":00")
+        + pd.to_timedelta(doses["hora"].astype(int), unit="h")
+    )
+    # Agenda no horário de Brasília (UTC-3), gravada em UTC como no banco
+    administrado = prevista + pd.to_timedelta(np.abs(gerador.normal(0, 30, len(doses))).round(), unit="min") + pd.Timedelta(hours=3)
+    tomada = (gerador.random(len(doses)) > 0.08) & (administrado < pd.Timestamp.utcnow().tz_localize(None))
+    d = int(tomada.sum())
+    tabelas["administracoes_medicamentos"] = pd.DataFrame({
+        "id": np.arange(1, d + 1),
+        "registro_id": pd.array([pd.NA] * d, dtype="Int64"),
+        "medicamento_id": doses.loc[tomada, "id"].to_numpy(),
+        "administrado_em": _texto(administrado[tomada].dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")),
+        "created_at": _texto(administrado[tomada].dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")),
+    })
+    return tabelas
+
+def gerar_dados(registros, pacientes=1, semente=42):
+    # Cada paciente tem o seu histórico completo de `registros` linhas
+    gerador = np.random.default_rng(semente)
+    por_paciente = [gerar_paciente(registros, gerador) for _ in range(pacientes)]
+    tabelas = {"pacientes": pd.DataFrame({
+        "id": np.arange(1, pacientes + 1),
+        "nome": _texto([f"Paciente {i:03d}" for i in range(1, pacientes + 1)]),
+        "created_at": _texto(np.full(pacientes, "2024-01-01T00:00:00+00:00")),
+    })}
+    # O usuário do benchmark cuida de todos os pacientes
+    tabelas["pacientes_usuarios"] = pd.DataFrame({
+        "id": np.arange(1, pacientes + 1),
+        "paciente_id": np.arange(1, pacientes + 1),
+        "usuario_id": _texto(np.full(pacientes, USUARIO["id"])),
+        "created_at": _texto(np.full(pacientes, "2024-01-01T00:00:00+00:00")),
+    })
+    for nome in por_paciente[0]:
+        partes = []
+        for indice, dados in enumerate(por_paciente):
+            parte = dados[nome].copy()
+            parte["paciente_id"] = indice + 1
+            if "cuidador_id" in parte.columns:
+                parte["cuidador_id"] += indice * len(CUIDADORES)
+            if "medicamento_id" in parte.columns:
+                parte["medicamento_id"] += indice * len(dados["medicamentos"])
+            partes.append(parte)
+        tabela = pd.concat(partes, ignore_index=True)
+        tabela["id"] = np.arange(1, len(tabela) + 1)
+        # updated_at: preenchido pelo gatilho do banco a cada alteração (ver supabase/migrations)
+        tabela["updated_at"] = tabela["created_at"]
+        tabelas[nome] = tabela
+    return tabelas
+
+# 👓 Gatilhos e views do banco (ver supabase/migrations)
+def _previa_fisioterapia(fisio):
+    partes = fisio.reindex(columns=["evolucao_tratamento", "exercicios", "quadro_clinico"]).astype(object)
+    partes = partes.where(partes.notna() & (partes != ""), None)
+    return _texto(partes.apply(lambda linha: " | ".join(v for v in linha if v), axis=1).str[:120])
+
+def _view_fisioterapia_resumo(tabelas):
+    return tabelas["fisioterapia"][["id", "data_sessao", "fisioterapeuta", "grau_dor", "forca_muscular",
+                                    "espasticidade", "estabilidade_motora", "previa", "paciente_id"]].copy()
+
+VIEWS = {"fisioterapia_resumo": _view_fisioterapia_resumo}
+
+class Banco:
+    def __init__(self, tabelas):
+        self.tabelas = tabelas
+        self.lock = threading.RLock()
+        self.requisicoes = 0
+        self.bytes_enviados = 0
+        self.por_caminho = {}
+        self.conexoes_tempo_real = []
+
+    def contar(self, caminho, tamanho):
+        with self.lock:
+            self.requisicoes += 1
+            self.bytes_enviados += tamanho
+            self.por_caminho[caminho] = self.por_caminho.get(caminho, 0) + 1
+
+    def estatisticas(self):
+        with self.lock:
+            return {"requisicoes": self.requisicoes, "bytes": self.bytes_enviados, "por_caminho": dict(self.por_caminho)}
+
+    def zerar(self):
+        with self.lock:
+            self.requisicoes = 0
+            self.bytes_enviados = 0
+            self.por_caminho = {}
+
+    def tabela(self, nome):
+        if nome in VIEWS:
+            return VIEWS[nome](self.tabelas)
+        return self.tabelas.get(nome)
+
+    def inserir(self, nome, linhas):
+        with self.lock:
+            df = self.tabelas.get(nome)
+            novas = pd.DataFrame(linhas)
+            proximo = int(df["id"].max()) + 1 if df is not None and len(df) else 1
+            if "id" not in novas.columns:
+                novas["id"] = np.arange(proximo, proximo + len(novas))
+            else:
+                faltando = novas["id"].isna()
+                novas.loc[faltando, "id"] = np.arange(proximo, proximo + faltando.sum())
+            if "created_at" not in novas.columns:
+                novas["created_at"] = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+            if df is not None and "updated_at" in df.columns:
+                novas["updated_at"] = novas["created_at"]
+            if nome == "fisioterapia":
+                novas["previa"] = _previa_fisioterapia(novas)
+            self.tabelas[nome] = novas if df is None else pd.concat([df, novas], ignore_index=True)
+            return novas
+
+# 🔎 Filtros do PostgREST viram máscaras booleanas sobre o DataFrame
+def _valor(coluna, texto):
+    if pd.api.types.is_bool_dtype(coluna):
+        return texto == "true"
+    if pd.api.types.is_numeric_dtype(coluna):
+        return float(texto)
+    return texto
+
+def _mascara(df, coluna, expressao):
+    negar = expressao.startswith("not.")
+    if negar:
+        expressao = expressao[4:]
+    operador, _, texto = expressao.partition(".")
+    if coluna not in df.columns:
+        mascara = pd.Series(False, index=df.index)
+    elif operador == "is":
+        mascara = df[coluna].isna() if texto == "null" else df[coluna] == (texto == "true")
+    elif operador == "in":
+        valores = [v.strip('"') for v in texto.strip("()").split(",")]
+        mascara = df[coluna].astype(str).isin(valores)
+    else:
+        # Valores com caracteres reservados (":", ".", ",") vêm entre aspas
+        valor = _valor(df[coluna], texto.strip('"'))
+        comparacoes = {"eq": "__eq__", "neq": "__ne__", "gt": "__gt__", "gte": "__ge__", "lt": "__lt__", "lte": "__le__"}
+        mascara = getattr(df[coluna], comparacoes[operador])(valor).fillna(False).astype(bool)
+    return ~mascara if negar else mascara
+
+def _separar(texto):
+    partes, nivel, atual = [], 0, ""
+    for caractere in texto:
+        nivel += caractere == "("
+        nivel -= caractere == ")"
+        if caractere == "," and nivel == 0:
+            partes.append(atual)
+            atual = ""
+        else:
+            atual += caractere
+    if atual:
+        partes.append(atual)
+    return partes
+
+def _logico(df, operador, texto):
+    mascaras = []
+    for parte in _separar(texto):
+        if parte.startswith(("and(", "or(")):
+            sub, _, resto = parte.partition("(")
+            mascaras.append(_logico(df, sub, resto[:-1]))
+        else:
+            coluna, _, expressao = parte.partition(".")
+            mascaras.append(_mascara(df, coluna, expressao))
+    resultado = mascaras[0]
+    for mascara in mascaras[1:]:
+        resultado = resultado & mascara if operador == "and" else resultado | mascara
+    return resultado
+
+PARAMETROS_RESERVADOS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+def filtrar(df, parametros):
+    mascara = pd.Series(True, index=df.index)
+    for chave, valor in parametros:
+        if chave in PARAMETROS_RESERVADOS:
+            continue
+        if chave in ("or", "and"):
+            mascara &= _logico(df, chave, valor[1:-1])
+        else:
+            mascara &= _mascara(df, chave, valor)
+    return df[mascara]
+
+def _json(df):
+    return df.to_json(orient="records", force_ascii=False, date_format="iso").encode()
+
+class Servidor(BaseHTTPRequestHandler):
+    banco = None
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, codigo, corpo=None, cabecalhos=None, bruto=None):
+        dados = bruto if bruto is not None else (json.dumps(corpo).encode() if corpo is not None else b"")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for chave, valor in (cabecalhos or {}).items():
+            self.send_header(chave, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+        if not self.path.startswith("/_"):
+            self.banco.contar(f"{self.command} {urlparse(self.path).path}", len(dados))
+
+    def _corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(tamanho)) if tamanho else None
+
+    def _erro(self, codigo, mensagem, codigo_pg):
+        return self._responder(codigo, {"message": mensagem, "code": codigo_pg, "hint": None, "details": None})
+
+    def _autenticacao(self, caminho):
+        if caminho.endswith("/user"):
+            return self._responder(200, USUARIO)
+        if caminho.endswith("/token") or caminho.endswith("/signup"):
+            self._corpo()
+            token = gerar_jwt()
+            return self._responder(200, {
+                "access_token": token, "refresh_token": "renovacao", "expires_in": 3600,
+                "expires_at": int(time.time()) + 3600, "token_type": "bearer", "user": USUARIO,
+            })
+        return self._responder(200, {})
+
+    def _consultar(self, nome, parametros):
+        df = self.banco.tabela(nome)
+        if df is None:
+            return self._erro(404, f"relation public.{nome} does not exist", "42P01")
+        df = filtrar(df, parametros)
+        opcoes = dict(parametros)
+        ordem = [parte.split(".") for parte in (opcoes.get("order") or "").split(",") if parte]
+        if ordem:
+            df = df.sort_values(
+                [partes[0] for partes in ordem],
+                ascending=["desc" not in partes[1:] for partes in ordem],
+                na_position="last",
+                kind="stable",
+            )
+        total = len(df)
+        inicio = int(opcoes.get("offset", 0))
+        quantidade = int(opcoes["limit"]) if "limit" in opcoes else None
+        # Range: 0-99 (cabeçalho) vale como offset/limit
+        intervalo_pedido = self.headers.get("Range")
+        if intervalo_pedido and "-" in intervalo_pedido:
+            de, _, ate = intervalo_pedido.partition("-")
+            inicio = int(de or 0)
+            quantidade = int(ate) - inicio + 1 if ate else quantidade
+        if MAX_LINHAS:
+            quantidade = MAX_LINHAS if quantidade is None else min(quantidade, MAX_LINHAS)
+        df = df.iloc[inicio:None if quantidade is None else inicio + quantidade]
+        selecao = opcoes.get("select", "*")
+        if selecao != "*":
+            df = df[[coluna.split(":")[0] for coluna in selecao.split(",") if coluna.split(":")[0] in df.columns]]
+        contar = "count=" in self.headers.get("Prefer", "")
+        intervalo = f"{inicio}-{inicio + max(len(df) - 1, 0)}/{total if contar else '*'}"
+        return self._responder(200, bruto=_json(df), cabecalhos={"Content-Range": intervalo})
+
+    def _rpc(self, funcao, corpo):
+        if funcao == "salvar_registros_diarios":
+            registros = [dict(r) for r in corpo.get("registros", [])]
+            medicamentos = [registro.pop("medicamento_ids", None) or [] for registro in registros]
+            agora = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+            horas = [registro.pop("administrado_em", None) or agora for registro in registros]
+            ids = self.banco.inserir("registros_diarios", registros)["id"].tolist() if registros else []
+            for registro, novo_id in zip(registros, ids):
+                notificar(self.banco, "registros_diarios", "INSERT", dict(registro, id=novo_id))
+            administracoes = [
+                {"registro_id": novo_id, "medicamento_id": medicamento_id,
+                 "paciente_id": registro.get("paciente_id"), "administrado_em": hora, "created_at": agora}
+                for registro, novo_id, ids_medicamentos, hora in zip(registros, ids, medicamentos, horas)
+                for medicamento_id in ids_medicamentos
+            ]
+            if administracoes:
+                novas = self.banco.inserir("administracoes_medicamentos", administracoes)
+                for linha in json.loads(_json(novas)):
+                    notificar(self.banco, "administracoes_medicamentos", "INSERT", linha)
+            return self._responder(200, ids)
+        return self._erro(404, f"Could not find the function public.{funcao}", "PGRST202")
+
+    def _rest(self, nome, parametros):
+        if nome.startswith("rpc/"):
+            return self._rpc(nome[4:], self._corpo() or {})
+        if self.command in ("GET", "HEAD"):
+            return self._consultar(nome, parametros)
+        with self.banco.lock:
+            df = self.banco.tabelas.get(nome)
+            if df is None:
+                return self._erro(404, f"relation public.{nome} does not exist", "42P01")
+            if self.command == "POST":
+                corpo = self._corpo()
+                linhas = corpo if isinstance(corpo, list) else [corpo]
+                prefer = self.headers.get("Prefer", "")
+                if "resolution=" in prefer:
+                    chave = dict(parametros).get("on_conflict", "id")
+                    existentes = set(df[chave].dropna().astype(str)) if chave in df.columns else set()
+                    linhas = [linha for linha in linhas if str(linha.get(chave)) not in existentes]
+                if nome == "administracoes_medicamentos" and "medicamentos" in self.banco.tabelas:
+                    # Chave estrangeira: a caixa de saída precisa lidar com linhas recusadas
+                    medicamentos = set(self.banco.tabelas["medicamentos"]["id"].tolist())
+                    if any(linha.get("medicamento_id") not in medicamentos for linha in linhas):
+                        return self._erro(409, "insert or update violates foreign key constraint", "23503")
+                novas = self.banco.inserir(nome, linhas) if linhas else pd.DataFrame()
+                for linha in json.loads(_json(novas)) if len(novas) else []:
+                    notificar(self.banco, nome, "INSERT", linha)
+                return self._responder(201, bruto=_json(novas))
+            alvo = filtrar(df, parametros)
+            if self.command == "PATCH":
+                corpo = self._corpo()
+                for coluna, valor in corpo.items():
+                    df.loc[alvo.index, coluna] = valor
+                if "updated_at" in df.columns:
+                    df.loc[alvo.index, "updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+                if nome == "fisioterapia":
+                    df.loc[alvo.index, "previa"] = _previa_fisioterapia(df.loc[alvo.index])
+                alterados = df.loc[alvo.index]
+                for linha in json.loads(_json(alterados)):
+                    notificar(self.banco, nome, "UPDATE", linha, {"id": linha["id"]})
+                return self._responder(200, bruto=_json(alterados))
+            if self.command == "DELETE":
+                self.banco.tabelas[nome] = df.drop(index=alvo.index)
+                for id_linha in alvo["id"].tolist():
+                    notificar(self.banco, nome, "DELETE", None, {"id": id_linha})
+                return self._responder(200, bruto=_json(alvo))
+        return self._erro(405, "método não suportado", "PGRST000")
+
+    def _despachar(self):
+        url = urlparse(self.path)
+        parametros = parse_qsl(url.query, keep_blank_values=True)
+        if url.path == "/_estatisticas":
+            return self._responder(200, self.banco.estatisticas())
+        if url.path == "/_zerar":
+            self.banco.zerar()
+            return self._responder(200, {})
+        if url.path.startswith("/realtime/v1/websocket") and self.headers.get("Upgrade", "").lower() == "websocket":
+            return TempoRealFalso(self).atender()
+        if LATENCIA_SEGUNDOS:
+            time.sleep(LATENCIA_SEGUNDOS)
+        if url.path.startswith("/auth/v1"):
+            return self._autenticacao(url.path)
+        if url.path.startswith("/rest/v1/"):
+            return self._rest(url.path[len("/rest/v1/"):], parametros)
+        return self._responder(404, {})
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_HEAD = _despachar
+
+# 📡 Websocket do Realtime: responde ao join do canal e envia postgres_changes
+# a cada escrita feita pela API falsa (formato Phoenix, vsn 1.0.0)
+class TempoRealFalso:
+    def __init__(self, pedido):
+        self.pedido = pedido
+        self.lock = threading.Lock()
+        self.assinaturas = {}
+
+    def atender(self):
+        chave = self.pedido.headers["Sec-WebSocket-Key"]
+        aceite = base64.b64encode(hashlib.sha1((chave + GUID_WEBSOCKET).encode()).digest()).decode()
+        self.pedido.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {aceite}\r\n\r\n"
+        ).encode())
+        self.pedido.wfile.flush()
+        banco = self.pedido.banco
+        with banco.lock:
+            banco.conexoes_tempo_real.append(self)
+        try:
+            while True:
+                codigo, dados = self._receber()
+                if codigo == 8:
+                    break
+                if codigo == 1:
+                    self._mensagem(json.loads(dados))
+        except (ConnectionError, ValueError, struct.error):
+            pass
+        finally:
+            with banco.lock:
+                banco.conexoes_tempo_real.remove(self)
+
+    def _receber(self):
+        leitor = self.pedido.rfile
+        primeiro, segundo = leitor.read(2)
+        tamanho = segundo & 0x7F
+        if tamanho == 126:
+            tamanho = struct.unpack("!H", leitor.read(2))[0]
+        elif tamanho == 127:
+            tamanho = struct.unpack("!Q", leitor.read(8))[0]
+        mascara = leitor.read(4) if segundo & 0x80 else b"\0\0\0\0"
+        dados = leitor.read(tamanho)
+        return primeiro & 0x0F, bytes(b ^ mascara[i % 4] for i, b in enumerate(dados))
+
+    def enviar(self, mensagem):
+        dados = json.dumps(mensagem).encode()
+        if len(dados) < 126:
+            cabecalho = struct.pack("!BB", 0x81, len(dados))
+        elif len(dados) < 65536:
+            cabecalho = struct.pack("!BBH", 0x81, 126, len(dados))
+        else:
+            cabecalho = struct.pack("!BBQ", 0x81, 127, len(dados))
+        with self.lock:
+            self.pedido.wfile.write(cabecalho + dados)
+            self.pedido.wfile.flush()
+
+    def _mensagem(self, mensagem):
+        resposta = {}
+        if mensagem["event"] == "phx_join":
+            ligacoes = mensagem["payload"]["config"].get("postgres_changes") or []
+            resposta = {"postgres_changes": []}
+            for id_ligacao, ligacao in enumerate(ligacoes, 1):
+                self.assinaturas[(mensagem["topic"], ligacao["table"])] = id_ligacao
+                resposta["postgres_changes"].append({
+                    "id": id_ligacao, "events": ligacao["events"], "table": ligacao["table"],
+                    "schema": ligacao.get("schema", "public"), "filter": ligacao.get("filter"),
+                })
+        self.enviar({
+            "topic": mensagem["topic"], "event": "phx_reply", "ref": mensagem.get("ref"),
+            "payload": {"status": "ok", "response": resposta},
+        })
+
+def notificar(banco, tabela, tipo, linha, linha_antiga=None):
+    with banco.lock:
+        conexoes = list(banco.conexoes_tempo_real)
+    for conexao in conexoes:
+        for (topico, nome), id_ligacao in list(conexao.assinaturas.items()):
+            if nome != tabela:
+                continue
+            try:
+                conexao.enviar({
+                    "topic": topico, "event": "postgres_changes", "ref": None,
+                    "payload": {"ids": [id_ligacao], "data": {
+                        "schema": "public", "table": tabela, "type": tipo,
+                        "commit_timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        "errors": None, "columns": [], "record": linha or {}, "old_record": linha_antiga or {},
+                    }},
+                })
+            except OSError:
+                pass
+
+def iniciar(tabelas, porta=0):
+    Servidor.banco = Banco(tabelas)
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), Servidor)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supabase falso para testes e benchmark")
+    parser.add_argument("--registros", type=int, default=1000, help="registros diários por paciente")
+    parser.add_argument("--pacientes", type=int, default=1)
+    parser.add_argument("--porta", type=int, default=0)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--max-linhas", type=int, default=MAX_LINHAS, help="limite de linhas por resposta (0: sem limite)")
+    argumentos = parser.parse_args()
+    LATENCIA_SEGUNDOS = argumentos.latencia_ms / 1000
+    MAX_LINHAS = argumentos.max_linhas
+    servidor = iniciar(gerar_dados(argumentos.registros, argumentos.pacientes), argumentos.porta)
+    # O benchmark lê a porta desta primeira linha
+    print(f"http://127.0.0.1:{servidor.server_port}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -1,14 +1,191 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import time
 from dotenv import load_dotenv
 import os
-from supabase import create_client
+import threading
+import asyncio
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from functools import partial
+from time import monotonic
+from supabase import create_client, ClientOptions
+from postgrest.exceptions import APIError
+import httpx
+import jwt
+import json
+import html
+import tempfile
+import sqlite3
+import uuid
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from realtime import AsyncRealtimeClient, RealtimeAcknowledgementStatus, RealtimeSubscribeStates
 
+inicio_execucao = monotonic()
 load_dotenv()
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
-supabase = create_client(supabase_url, supabase_key)
+TEMPO_LIMITE_CONSULTA = float(os.getenv("TEMPO_LIMITE_CONSULTA", "10"))
+CONEXOES_HTTP_MAXIMAS = int(os.getenv("CONEXOES_HTTP_MAXIMAS", "20"))
+MARGEM_RENOVACAO_TOKEN_SEGUNDOS = int(os.getenv("MARGEM_RENOVACAO_TOKEN_SEGUNDOS", "60"))
+
+# 📊 Instrumentação: cada chamada HTTP ao Supabase (pelos event hooks do httpx)
+# e os blocos pesados da página (carga das tabelas, montagem de DataFrames,
+# st.dataframe, a aba inteira) registram tempo, linhas e bytes. As amostras
+# ficam por sessão e por processo; os percentis aparecem num painel só para
+# admins e, com METRICAS_DESTINO, vão em lotes para um arquivo JSONL ou uma URL.
+METRICAS_AMOSTRAS = int(os.getenv("METRICAS_AMOSTRAS", "500"))
+METRICAS_DESTINO = os.getenv("METRICAS_DESTINO", "")
+METRICAS_LOTE = int(os.getenv("METRICAS_LOTE", "100"))
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+class Metricas:
+    def __init__(self, destino=""):
+        self.destino = destino
+        self._amostras = {}
+        self._pendentes = []
+        self._lock = threading.Lock()
+
+    def registrar(self, nome, segundos, linhas=None, tamanho=None):
+        with self._lock:
+            if nome not in self._amostras:
+                # Só as últimas amostras de cada medida, para a memória não crescer
+                self._amostras[nome] = deque(maxlen=METRICAS_AMOSTRAS)
+            self._amostras[nome].append((segundos, linhas, tamanho))
+            if not self.destino:
+                return
+            self._pendentes.append({
+                "momento": datetime.now().isoformat(timespec="seconds"),
+                "medida": nome,
+                "ms": round(segundos * 1000, 2),
+                "linhas": linhas,
+                "bytes": tamanho,
+            })
+            if len(self._pendentes) < METRICAS_LOTE:
+                return
+            lote, self._pendentes = self._pendentes, []
+        # Gravação fora da execução da página
+        threading.Thread(target=self._exportar, args=(lote,), daemon=True).start()
+
+    def _exportar(self, lote):
+        try:
+            if self.destino.startswith(("http://", "https://")):
+                httpx.post(self.destino, json=lote, timeout=5)
+            else:
+                with open(self.destino, "a", encoding="utf-8") as arquivo:
+                    arquivo.writelines(json.dumps(metrica, ensure_ascii=False) + "\n" for metrica in lote)
+        except (OSError, httpx.HTTPError):
+            # Métrica perdida não pode derrubar o app
+            pass
+
+    def resumo(self):
+        with self._lock:
+            copia = {nome: list(amostras) for nome, amostras in self._amostras.items()}
+        linhas = []
+        for nome, amostras in copia.items():
+            tempos = np.array([amostra[0] for amostra in amostras]) * 1000
+            quantidades = [amostra[1] for amostra in amostras if amostra[1] is not None]
+            tamanhos = [amostra[2] for amostra in amostras if amostra[2] is not None]
+            p50, p95, p99 = np.percentile(tempos, [50, 95, 99])
+            linhas.append({
+                "medida": nome,
+                "amostras": len(amostras),
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "max_ms": tempos.max(),
+                "linhas": np.mean(quantidades) if quantidades else None,
+                "kb": np.mean(tamanhos) / 1024 if tamanhos else None,
+            })
+        if not linhas:
+            return pd.DataFrame()
+        return pd.DataFrame(linhas).sort_values("p95_ms", ascending=False)
+
+@st.cache_resource
+def obter_metricas_processo():
+    return Metricas(METRICAS_DESTINO)
+
+metricas_processo = obter_metricas_processo()
+if "metricas_sessao" not in st.session_state:
+    st.session_state["metricas_sessao"] = Metricas()
+metricas_sessao = st.session_state["metricas_sessao"]
+
+def registrar_metrica(nome, segundos, linhas=None, tamanho=None, sessao=None):
+    metricas_processo.registrar(nome, segundos, linhas, tamanho)
+    (sessao or metricas_sessao).registrar(nome, segundos, linhas, tamanho)
+
+@contextmanager
+def medir(nome, linhas=None):
+    medida = {"linhas": linhas, "bytes": None}
+    inicio = monotonic()
+    try:
+        yield medida
+    finally:
+        registrar_metrica(nome, monotonic() - inicio, medida["linhas"], medida["bytes"])
+
+def ganchos_http(sessao):
+    # As chamadas podem sair de threads (consultas em paralelo, caixa de saída),
+    # por isso a sessão vai fixa no gancho em vez de vir do st.session_state
+    def ao_enviar(requisicao):
+        requisicao.extensions["inicio_medida"] = monotonic()
+
+    def ao_receber(resposta):
+        resposta.read()
+        requisicao = resposta.request
+        segundos = monotonic() - requisicao.extensions.get("inicio_medida", monotonic())
+        # Content-Range do PostgREST: "0-49/*" são 50 linhas
+        intervalo = resposta.headers.get("content-range", "").split("/")[0]
+        linhas = None
+        if "-" in intervalo:
+            primeira, ultima = intervalo.split("-")
+            linhas = int(ultima) - int(primeira) + 1
+        nome = f"{requisicao.method} {requisicao.url.path.split('/v1/', 1)[-1]}"
+        registrar_metrica(nome, segundos, linhas, len(resposta.content), sessao)
+
+    return {"request": [ao_enviar], "response": [ao_receber]}
+
+# 🔌 Conexões HTTP (TLS + HTTP/2) compartilhadas por todas as sessões do processo
+@st.cache_resource
+def obter_transporte_http():
+    return httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=CONEXOES_HTTP_MAXIMAS,
+            max_keepalive_connections=CONEXOES_HTTP_MAXIMAS
+        )
+    )
+
+# Um cliente por sessão (o token do usuário fica no cliente), criado uma única vez
+# e reaproveitado nos reruns; o transporte por baixo é o mesmo para todos
+def obter_cliente_supabase():
+    if "cliente_supabase" not in st.session_state:
+        http = httpx.Client(
+            transport=obter_transporte_http(),
+            timeout=TEMPO_LIMITE_CONSULTA,
+            follow_redirects=True,
+            event_hooks=ganchos_http(metricas_sessao)
+        )
+        st.session_state["cliente_supabase"] = create_client(
+            supabase_url,
+            supabase_key,
+            options=ClientOptions(
+                postgrest_client_timeout=TEMPO_LIMITE_CONSULTA,
+                httpx_client=http,
+                # A renovação é feita por garantir_sessao(), só quando o token está para vencer
+                auto_refresh_token=False
+            )
+        )
+    return st.session_state["cliente_supabase"]
+
+supabase = obter_cliente_supabase()
 
 # --- Inicializa flags ---
 if "token_processado" not in st.session_state:
@@ -24,6 +201,7 @@ if token and not st.session_state.get("token_processado", False):
     try:
         session = supabase.auth.set_session(token, "")
         st.session_state["access_token"] = token
+        st.session_state["token_aplicado"] = token
         st.session_state["usuario"] = session.user
         st.session_state["token_processado"] = True
         st.query_params.clear()
@@ -34,7 +212,7 @@ if token and not st.session_state.get("token_processado", False):
 
 # --- Função de login com cadastro ---
 def login_page():
-    st.title("🔐 Login no Sistema de Cuidador (Fernando Paiva)")
+    st.title("🔐 Login no Sistema de Cuidador")
     aba = st.radio("Acesso:", ["Entrar", "Cadastrar novo usuário"])
 
     if aba == "Entrar":
@@ -46,6 +224,7 @@ def login_page():
                 st.session_state["usuario"] = result.user
                 st.session_state["access_token"] = result.session.access_token
                 st.session_state["refresh_token"] = result.session.refresh_token
+                st.session_state["token_aplicado"] = result.session.access_token
                 st.session_state["token_processado"] = True
                 st.success("✅ Login realizado com sucesso!")
                 st.rerun()
@@ -62,45 +241,1849 @@ def login_page():
             except Exception as e:
                 st.error("Erro ao cadastrar: " + str(e))
 
+# 🔑 Validade do token lida localmente (sem ir ao servidor de autenticação)
+def segundos_ate_expirar(token):
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.PyJWTError:
+        return 0
+    return exp - datetime.now().timestamp() if exp else 0
+
+def usuario_do_token(token):
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("sub")
+    except jwt.PyJWTError:
+        return None
+
+def garantir_sessao():
+    access_token = st.session_state["access_token"]
+    if segundos_ate_expirar(access_token) > MARGEM_RENOVACAO_TOKEN_SEGUNDOS:
+        if st.session_state.get("token_aplicado") != access_token:
+            # Token válido que este cliente ainda não conhece: só ajusta o cabeçalho
+            supabase.options.headers["Authorization"] = f"Bearer {access_token}"
+            supabase.postgrest.auth(access_token)
+            st.session_state["token_aplicado"] = access_token
+        return
+    # Perto de vencer: uma única chamada de renovação
+    resposta = supabase.auth.refresh_session(st.session_state.get("refresh_token"))
+    st.session_state["access_token"] = resposta.session.access_token
+    st.session_state["refresh_token"] = resposta.session.refresh_token
+    st.session_state["token_aplicado"] = resposta.session.access_token
+
 # --- Verificação de login ---
 if st.session_state.get("usuario") is None:
     login_page()
     st.stop()
 else:
-    supabase.auth.set_session(
-        st.session_state["access_token"],
-        st.session_state["refresh_token"]
-    )
+    try:
+        garantir_sessao()
+    except Exception:
+        st.session_state["usuario"] = None
+        st.warning("⚠️ Sua sessão expirou. Entre novamente.")
+        login_page()
+        st.stop()
 
 # 🩺 Título principal
-st.title("🩺 Sistema de monitoramento para Cuidadores de Fernando Paiva")
+st.title("🩺 Sistema de monitoramento para Cuidadores")
 
 # ℹ️ Aviso com letra menor
-st.markdown("<small><i>Este sistema é exclusivo para uso interno da equipe de cuidados de Fernando Paiva.</i></small>", unsafe_allow_html=True)
+st.markdown("<small><i>Este sistema é exclusivo para uso interno das equipes de cuidados.</i></small>", unsafe_allow_html=True)
+
+# 📚 Opções dos formulários. As mesmas listas definem as categorias das
+# colunas na hora de carregar as tabelas (ver ESQUEMAS).
+OPCOES_QUANTIDADE = [str(n) for n in range(11)]
+OPCOES_CARACTERISTICA_FEZE = ["Normal (Fecaloma)", "Pastoso", "Diarreia"]
+OPCOES_ASPECTO_URINA = ["Normal", "Escura", "Clara", "Com odor forte", "Com sangue", "Com pus", "Outro"]
+OPCOES_SONO = [f"{h}h {m}min" if m > 0 else f"{h}h" for h in range(3, 13) for m in [0, 30]]
+OPCOES_ESPECIALIDADE = ["Geral", "Técnico em Enfermagem", "Enfermeiro", "Cuidador", "Outro"]
+OPCOES_FREQUENCIA = ["1x ao dia", "2x ao dia", "3x ao dia", "A cada 8h", "Sob demanda"]
+OPCOES_REFEICAO = ["Café da Manhã", "Almoço", "Lanche", "Jantar", "Ceia"]
+OPCOES_ACEITACAO = ["Sim", "Parcialmente", "Recusou"]
+OPCOES_FORCA_MUSCULAR = [
+    "0 - Sem contração", "1 - Contração palpável",
+    "2 - Movimento sem gravidade", "3 - Movimento contra gravidade",
+    "4 - Movimento contra resistência leve", "5 - Força normal",
+]
+OPCOES_ESPASTICIDADE = ["Normal", "Leve", "Moderada", "Grave"]
+OPCOES_ESTABILIDADE_MOTORA = ["Estável", "Melhora", "Declínio", "Instável"]
+
+# 🧱 Tipos das colunas de cada tabela, aplicados ao carregar. Listas viram
+# categorias (na ordem do formulário), "data"/"data_hora" viram datetime,
+# "texto" vira string do pyarrow e o resto é um dtype do pandas. A formatação
+# para exibição (ex.: dd/mm/aaaa) fica só na hora de mostrar.
+ESQUEMAS = {
+    "registros_diarios": {
+        "data": "data",
+        "created_at": "data_hora",
+        "updated_at": "data_hora",
+        "temperatura": "float32",
+        "saturacao": "Int8",
+        "frequencia_cardiaca": "Int16",
+        "quantidade_feze": "Int8",
+        "quantidade_urina": "Int8",
+        "caracteristica_feze": OPCOES_CARACTERISTICA_FEZE,
+        "aspecto_urina": OPCOES_ASPECTO_URINA,
+        "sono": OPCOES_SONO,
+        "cuidador": "texto",
+        "pressao": "texto",
+        "observacao": "texto",
+        "observacao_geral": "texto",
+    },
+    "cuidadores": {
+        "created_at": "data_hora",
+        "updated_at": "data_hora",
+        "nome": "texto",
+        "idade": "Int8",
+        "telefone": "texto",
+        "especialidade": OPCOES_ESPECIALIDADE,
+        "disponibilidade": "Int8",
+    },
+    "medicamentos": {
+        "created_at": "data_hora",
+        "updated_at": "data_hora",
+        "nome": "texto",
+        "dosagem": "texto",
+        "frequencia": OPCOES_FREQUENCIA,
+        "horario": "texto",
+        "observacoes": "texto",
+        "fim": "data",
+        "ativo": "boolean",
+    },
+    "alimentacao": {
+        "created_at": "data_hora",
+        "updated_at": "data_hora",
+        "refeicao": OPCOES_REFEICAO,
+        "alimentos": "texto",
+        "quantidade": "texto",
+        "aceitou": OPCOES_ACEITACAO,
+        "horario": "texto",
+        "responsavel": "texto",
+        "observacoes": "texto",
+    },
+    "fisioterapia": {
+        "data_sessao": "data",
+        "created_at": "data_hora",
+        "updated_at": "data_hora",
+        "fisioterapeuta": "texto",
+        "previa": "texto",
+        "grau_dor": "Int8",
+        "forca_muscular": OPCOES_FORCA_MUSCULAR,
+        "espasticidade": OPCOES_ESPASTICIDADE,
+        "estabilidade_motora": OPCOES_ESTABILIDADE_MOTORA,
+    },
+    "administracoes_medicamentos": {
+        "administrado_em": "data_hora",
+        "created_at": "data_hora",
+        "updated_at": "data_hora",
+        "registro_id": "Int64",
+        "medicamento_id": "Int64",
+    },
+}
+
+def converter_coluna(serie, tipo):
+    if isinstance(tipo, list):
+        # Valores antigos fora da lista não se perdem: entram como categorias extras
+        extras = sorted(set(serie.dropna().astype(str)) - set(tipo))
+        return serie.astype("string").astype(pd.CategoricalDtype(tipo + extras))
+    if tipo == "data":
+        return pd.to_datetime(serie, errors="coerce")
+    if tipo == "data_hora":
+        return pd.to_datetime(serie, errors="coerce", utc=True, format="ISO8601")
+    if tipo == "texto":
+        return serie.astype("string[pyarrow]")
+    numeros = pd.to_numeric(serie, errors="coerce")
+    if tipo.startswith("Int"):
+        numeros = numeros.round()
+    return numeros.astype(tipo)
+
+def aplicar_esquema(nome, df):
+    for coluna, tipo in ESQUEMAS.get(nome, {}).items():
+        if coluna not in df.columns:
+            continue
+        try:
+            df[coluna] = converter_coluna(df[coluna], tipo)
+        except (TypeError, ValueError, OverflowError):
+            # Valor fora do tipo previsto (ex.: número grande demais): mantém a coluna como veio
+            pass
+    return df
+
+# ⏱️ Cache das tabelas (TTL + LRU), compartilhado por todas as sessões do processo
+CACHE_TTL_SEGUNDOS = float(os.getenv("CACHE_TTL_SEGUNDOS", "60"))
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "32"))
+
+class CacheTabelas:
+    # As chaves são tuplas que começam pelo nome da tabela, assim dá para
+    # invalidar só as entradas da tabela que foi alterada.
+    def __init__(self, ttl, max_entradas):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            criado_em, valor = entrada
+            if monotonic() - criado_em > self.ttl:
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._entradas[chave] = (monotonic(), valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, tabela, paciente_id=None):
+        # Chaves das tabelas por paciente: (tabela, paciente_id, ...)
+        with self._lock:
+            for chave in [
+                c for c in self._entradas
+                if c[0] == tabela and (paciente_id is None or (len(c) > 1 and c[1] == paciente_id))
+            ]:
+                del self._entradas[chave]
+
+@st.cache_resource
+def obter_cache_tabelas():
+    return CacheTabelas(CACHE_TTL_SEGUNDOS, CACHE_MAX_ENTRADAS)
+
+cache_tabelas = obter_cache_tabelas()
+
+# 🔄 Sincronização incremental: cada tabela tem uma cópia local e uma marca d'água
+# (updated_at, created_at ou id). Depois da primeira carga só as linhas novas ou
+# alteradas são buscadas, em páginas, com uma folga para trás na marca (ver
+# buscar_alteracoes). De tempos em tempos a contagem de linhas do servidor é
+# comparada com a da cópia para pegar exclusões; a tabela só é baixada de novo
+# se as contagens não batem (ou, por garantia, a cada SINCRONIZACAO_COMPLETA_SEGUNDOS).
+SINCRONIZACAO_COMPLETA_SEGUNDOS = float(os.getenv("SINCRONIZACAO_COMPLETA_SEGUNDOS", "604800"))
+SINCRONIZACAO_VERIFICACAO_SEGUNDOS = float(os.getenv("SINCRONIZACAO_VERIFICACAO_SEGUNDOS", "3600"))
+# O now() do banco é o início da transação: uma linha pode aparecer com updated_at
+# um pouco anterior à marca já vista. A busca volta esta folga para trás.
+SINCRONIZACAO_FOLGA_SEGUNDOS = float(os.getenv("SINCRONIZACAO_FOLGA_SEGUNDOS", "60"))
+SINCRONIZACAO_PAGINA = int(os.getenv("SINCRONIZACAO_PAGINA", "1000"))
+COLUNAS_MARCA = ["updated_at", "created_at", "id"]
+# Tabelas cuja cópia local guarda só algumas colunas (as demais são textos longos
+# buscados sob demanda); as outras guardam a linha inteira
+COLUNAS_ESPELHO = {
+    "fisioterapia": [
+        "id", "paciente_id", "created_at", "updated_at", "data_sessao", "fisioterapeuta", "grau_dor",
+        "forca_muscular", "espasticidade", "estabilidade_motora", "cuidador_id", "previa",
+    ],
+}
+
+class EspelhoTabela:
+    def __init__(self, paciente_id):
+        self.paciente_id = paciente_id
+        self.df = None
+        self.coluna_marca = None
+        self.marca = None
+        self.carregado_em = 0.0
+        # Última comparação da contagem de linhas com a do servidor
+        self.verificado_em = 0.0
+        # Início da última consulta à API (ver TempoReal.em_dia)
+        self.sincronizado_em = 0.0
+        # Somas e contagens por dia de cada métrica (ver atualizar_agregados);
+        # None quer dizer que ainda precisam ser calculadas a partir do df
+        self.agregados = None
+        # Índice de facetas das linhas do df (ver IndiceFacetas), montado sob demanda
+        self.facetas = None
+        self.lock = threading.Lock()
+
+# Cópias em memória, agrupadas por paciente. Os pacientes que ninguém abre há
+# mais tempo saem da memória (LRU, como CacheTabelas); o Parquet em disco fica,
+# e a próxima abertura lê de lá e busca só o que mudou desde a marca.
+ESPELHOS_MAX_PACIENTES = int(os.getenv("ESPELHOS_MAX_PACIENTES", "8"))
+
+class EspelhosPacientes:
+    def __init__(self, max_pacientes):
+        self.max_pacientes = max_pacientes
+        # Chave: paciente_id; valor: {tabela: EspelhoTabela}
+        self._pacientes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, nome, paciente_id):
+        with self._lock:
+            tabelas = self._pacientes.setdefault(paciente_id, {})
+            self._pacientes.move_to_end(paciente_id)
+            while len(self._pacientes) > self.max_pacientes:
+                self._pacientes.popitem(last=False)
+            if nome not in tabelas:
+                tabelas[nome] = EspelhoTabela(paciente_id)
+            return tabelas[nome]
+
+    def itens(self):
+        # Pares ((tabela, paciente_id), espelho) dos pacientes em memória
+        with self._lock:
+            return [
+                ((nome, paciente_id), espelho)
+                for paciente_id, tabelas in self._pacientes.items()
+                for nome, espelho in tabelas.items()
+            ]
+
+@st.cache_resource
+def obter_espelhos():
+    return EspelhosPacientes(ESPELHOS_MAX_PACIENTES)
+
+espelhos = obter_espelhos()
+
+# 🗄️ Espelho em disco (Parquet, um arquivo por mês), para o histórico não ser
+# baixado de novo a cada reinício do app: a primeira leitura carrega os arquivos
+# inteiros na memória (eles já só têm as colunas da cópia, ver COLUNAS_ESPELHO)
+# e só o que mudou desde a marca d'água vem da API. A cada sincronização (e a
+# cada mudança recebida em tempo real) só são regravados os meses das linhas
+# novas e os das versões que elas substituíram ou apagaram.
+ESPELHO_DIRETORIO = os.getenv("ESPELHO_DIRETORIO", ".espelho")
+# Coluna que define o mês de cada linha; as demais tabelas usam created_at
+COLUNAS_PARTICAO = {
+    "registros_diarios": "data",
+    "fisioterapia": "data_sessao",
+    "administracoes_medicamentos": "administrado_em",
+}
+
+# Linhas sem data (NaT vira o menor int64)
+SEM_MES = np.iinfo(np.int64).min
+
+def meses_das_linhas(nome, df):
+    # Mês de cada linha como inteiro (meses desde 1970, o int64 de um
+    # datetime64[M]): comparar inteiros é barato mesmo com 1M de linhas, e o
+    # texto "AAAA-MM" só é montado para o nome de cada arquivo
+    coluna = COLUNAS_PARTICAO.get(nome, "created_at")
+    if coluna not in df.columns:
+        return np.full(len(df), SEM_MES, dtype=np.int64)
+    datas = df[coluna]
+    if not pd.api.types.is_datetime64_any_dtype(datas):
+        datas = pd.to_datetime(datas, errors="coerce", utc=True)
+    if isinstance(datas.dtype, pd.DatetimeTZDtype):
+        datas = datas.dt.tz_convert("UTC").dt.tz_localize(None)
+    return datas.to_numpy("datetime64[M]").astype(np.int64)
+
+def arquivo_do_mes(mes):
+    return "sem_data" if mes == SEM_MES else str(np.datetime64(int(mes), "M"))
+
+def pasta_espelho(nome, espelho):
+    return Path(ESPELHO_DIRETORIO) / nome / f"paciente_{espelho.paciente_id}"
+
+def ler_espelho_parquet(nome, espelho):
+    pasta = pasta_espelho(nome, espelho)
+    arquivo_estado = pasta / "estado.json"
+    if not arquivo_estado.exists():
+        return
+    partes = [pq.read_table(arquivo) for arquivo in sorted(pasta.glob("*.parquet"))]
+    if partes:
+        espelho.df = aplicar_esquema(nome, pa.concat_tables(partes, promote_options="default").to_pandas())
+        if nome in COLUNAS_ESPELHO:
+            espelho.df = espelho.df[espelho.df.columns.intersection(COLUNAS_ESPELHO[nome])]
+    else:
+        espelho.df = pd.DataFrame()
+    espelho.agregados = None
+    espelho.facetas = None
+    estado = json.loads(arquivo_estado.read_text())
+    espelho.coluna_marca = estado["coluna_marca"]
+    espelho.marca = estado["marca"]
+    espelho.carregado_em = estado["carregado_em"]
+    df = espelho.df
+    if "id" in df.columns and df["id"].duplicated().any():
+        # Linha que mudou de mês e ficou também no arquivo do mês antigo
+        # (espelhos gravados antes de o mês antigo ser regravado): vale a
+        # versão com a marca d'água mais recente
+        if espelho.coluna_marca in df.columns:
+            df = df.sort_values(espelho.coluna_marca, kind="stable")
+        espelho.df = df.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
+
+def gravar_espelho_parquet(nome, espelho, meses=None):
+    # O disco é só um atalho para a próxima carga; os dados já estão em memória.
+    # Uma falha na gravação não interrompe a sincronização: fica registrada nas
+    # métricas (painel de desempenho e METRICAS_DESTINO) com o tipo do erro.
+    inicio = monotonic()
+    try:
+        escrever_espelho_parquet(nome, espelho, meses)
+    except Exception as e:
+        metricas_processo.registrar(
+            f"falha ao gravar espelho {nome} ({type(e).__name__})", monotonic() - inicio, len(espelho.df)
+        )
+
+def escrever_espelho_parquet(nome, espelho, meses):
+    # meses=None regrava a tabela inteira (depois de uma carga completa)
+    pasta = pasta_espelho(nome, espelho)
+    pasta.mkdir(parents=True, exist_ok=True)
+    df = espelho.df
+    meses_df = meses_das_linhas(nome, df)
+    if meses is None:
+        for arquivo in pasta.glob("*.parquet"):
+            arquivo.unlink()
+        meses = set(np.unique(meses_df).tolist())
+    for mes in meses:
+        destino = pasta / f"{arquivo_do_mes(mes)}.parquet"
+        temporario = pasta / f"{arquivo_do_mes(mes)}.parquet.tmp"
+        linhas = df[meses_df == mes]
+        if linhas.empty:
+            # Mês que ficou sem linhas (apagadas ou movidas para outro mês)
+            destino.unlink(missing_ok=True)
+            continue
+        pq.write_table(pa.Table.from_pandas(linhas, preserve_index=False), temporario)
+        os.replace(temporario, destino)
+    estado = {
+        "coluna_marca": espelho.coluna_marca,
+        "marca": espelho.marca,
+        "carregado_em": espelho.carregado_em,
+    }
+    (pasta / "estado.json").write_text(
+        json.dumps(estado, default=lambda v: v.item() if hasattr(v, "item") else str(v))
+    )
+
+def gravar_meses_alterados(nome, espelho, novos, antigos):
+    # Meses das linhas novas e das versões anteriores: uma linha alterada pode
+    # ter mudado de mês e uma apagada precisa sair do arquivo em que estava
+    meses = set()
+    for linhas in (novos, antigos):
+        if linhas is not None and not linhas.empty:
+            meses.update(meses_das_linhas(nome, linhas).tolist())
+    if not meses:
+        return
+    gravar_espelho_parquet(nome, espelho, meses)
+
+def mesclar_linhas(df, novos):
+    # Alinha as categorias dos dois lados antes do concat, senão a coluna vira object.
+    # novos é copiado: quem chamou ainda usa as linhas como vieram (agregados, facetas)
+    df = df.copy(deep=False)
+    novos = novos.copy()
+    for coluna in df.columns.intersection(novos.columns):
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            faltando = pd.Index(novos[coluna].dropna().astype(str).unique()).difference(df[coluna].cat.categories)
+            if len(faltando):
+                df[coluna] = df[coluna].cat.add_categories(faltando)
+            novos[coluna] = novos[coluna].astype(str).where(novos[coluna].notna()).astype(df[coluna].dtype)
+    df = pd.concat([df, novos], ignore_index=True)
+    if "id" in df.columns:
+        df = df.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
+    return df
+
+def atualizar_marca(espelho):
+    df = espelho.df
+    if espelho.coluna_marca and espelho.coluna_marca in df.columns and not df.empty:
+        marca = df[espelho.coluna_marca].max()
+        if pd.isna(marca):
+            espelho.marca = None
+        else:
+            espelho.marca = marca.isoformat() if isinstance(marca, pd.Timestamp) else marca
+
+def descartar_repetidas(novos, antigos):
+    # Linhas que voltaram da API (ou da assinatura) iguais à versão que já está no
+    # espelho: mesclá-las de novo só mudaria a posição delas no df
+    if antigos is None or antigos.empty or novos.empty:
+        return novos
+    colunas = list(novos.columns.intersection(antigos.columns))
+    assinaturas = pd.util.hash_pandas_object(antigos[colunas].astype(str), index=False)
+    repetidas = pd.util.hash_pandas_object(novos[colunas].astype(str), index=False).isin(assinaturas)
+    return novos[~repetidas.to_numpy()]
+
+def atualizar_facetas(espelho, novos, antigos, linhas_antes):
+    if espelho.facetas is None:
+        return
+    so_inclusoes = (
+        (antigos is None or antigos.empty)
+        and novos is not None
+        and linhas_antes + len(novos) == len(espelho.df)
+    )
+    if so_inclusoes:
+        espelho.facetas.adicionar(novos)
+    else:
+        # Alteração ou exclusão muda as posições das linhas: o índice é refeito na próxima leitura
+        espelho.facetas = None
+
+def aplicar_mudanca(nome, espelho, tipo, linha, linha_antiga):
+    # Mudança recebida pela assinatura em tempo real (ver TempoReal)
+    df = espelho.df
+    linhas_antes = len(df)
+    novos = None
+    id_linha = (linha or linha_antiga or {}).get("id")
+    antigos = df[df["id"] == id_linha] if id_linha is not None and "id" in df.columns else None
+    if tipo == "DELETE":
+        if linha_antiga and "id" in linha_antiga and "id" in df.columns:
+            df = df[df["id"] != linha_antiga["id"]].reset_index(drop=True)
+    elif linha:
+        if nome in COLUNAS_ESPELHO:
+            linha = {coluna: valor for coluna, valor in linha.items() if coluna in COLUNAS_ESPELHO[nome]}
+        novos = descartar_repetidas(aplicar_esquema(nome, pd.DataFrame([linha])), antigos)
+        if novos.empty:
+            # A sincronização já tinha trazido esta versão da linha
+            return
+        df = mesclar_linhas(df, novos)
+    espelho.df = df
+    atualizar_marca(espelho)
+    atualizar_agregados(nome, espelho, novos, antigos)
+    atualizar_facetas(espelho, novos, antigos, linhas_antes)
+    gravar_meses_alterados(nome, espelho, novos, antigos)
+
+def paginar(nova_consulta, coluna, tamanho):
+    # Páginas pela chave (coluna, id) em ordem crescente. Só para numa página vazia:
+    # o max-rows do PostgREST pode devolver menos que `tamanho` sem ser a última
+    cursor = None
+    while True:
+        consulta = nova_consulta()
+        if cursor and coluna == "id":
+            consulta = consulta.gt("id", cursor[1])
+        elif cursor:
+            valor, id_cursor = cursor
+            consulta = consulta.or_(f'{coluna}.gt."{valor}",and({coluna}.eq."{valor}",id.gt.{id_cursor})')
+        consulta = consulta.order(coluna)
+        if coluna != "id":
+            consulta = consulta.order("id")
+        dados = consulta.limit(tamanho).execute().data
+        if not dados:
+            return
+        yield dados
+        cursor = (dados[-1][coluna], dados[-1]["id"])
+
+def consulta_espelho(nome, paciente_id):
+    return supabase.table(nome).select(*COLUNAS_ESPELHO.get(nome, ["*"])).eq("paciente_id", paciente_id)
+
+def recarregar_tabela(nome, espelho, paciente_id):
+    linhas = []
+    for pagina in paginar(lambda: consulta_espelho(nome, paciente_id), "id", SINCRONIZACAO_PAGINA):
+        linhas.extend(pagina)
+    with medir(f"DataFrame {nome}", len(linhas)):
+        df = aplicar_esquema(nome, pd.DataFrame(linhas))
+    espelho.df = df
+    espelho.carregado_em = espelho.verificado_em = datetime.now().timestamp()
+    espelho.coluna_marca = next((c for c in COLUNAS_MARCA if c in df.columns), None)
+    espelho.agregados = None
+    espelho.facetas = None
+    atualizar_marca(espelho)
+    gravar_espelho_parquet(nome, espelho)
+
+def buscar_alteracoes(nome, espelho, paciente_id):
+    coluna, desde = espelho.coluna_marca, espelho.marca
+    if coluna != "id":
+        # gte e com folga: linhas com a mesma marca (ou de transações que começaram
+        # antes dela) podem ter chegado depois; as repetidas são descartadas abaixo
+        desde = (pd.Timestamp(desde) - pd.Timedelta(seconds=SINCRONIZACAO_FOLGA_SEGUNDOS)).isoformat()
+    linhas = []
+    for pagina in paginar(lambda: consulta_espelho(nome, paciente_id).gte(coluna, desde), coluna, SINCRONIZACAO_PAGINA):
+        linhas.extend(pagina)
+    with medir(f"DataFrame {nome}", len(linhas)):
+        novos = aplicar_esquema(nome, pd.DataFrame(linhas))
+    if novos.empty:
+        return
+    # Versões anteriores das linhas que voltaram (alteradas ou repetidas pela folga)
+    antigos = espelho.df[espelho.df["id"].isin(novos["id"])] if "id" in novos.columns else None
+    novos = descartar_repetidas(novos, antigos)
+    if novos.empty:
+        return
+    if antigos is not None:
+        antigos = antigos[antigos["id"].isin(novos["id"])]
+    linhas_antes = len(espelho.df)
+    # A marca só anda depois que todas as páginas chegaram
+    espelho.df = mesclar_linhas(espelho.df, novos)
+    atualizar_marca(espelho)
+    atualizar_agregados(nome, espelho, novos, antigos)
+    atualizar_facetas(espelho, novos, antigos, linhas_antes)
+    gravar_meses_alterados(nome, espelho, novos, antigos)
+
+def contar_linhas(nome, paciente_id):
+    return supabase.table(nome).select("id", count="exact").eq("paciente_id", paciente_id).limit(1).execute().count
+
+def sincronizar_tabela(nome, paciente_id, usuario_id):
+    espelho = espelhos.obter(nome, paciente_id)
+    with espelho.lock:
+        if espelho.df is None:
+            try:
+                ler_espelho_parquet(nome, espelho)
+            except Exception:
+                # Espelho corrompido ou de outra versão: recarrega tudo da API
+                espelho.df = None
+        agora = datetime.now().timestamp()
+        if (
+            espelho.df is None
+            or espelho.marca is None
+            or agora - espelho.carregado_em > SINCRONIZACAO_COMPLETA_SEGUNDOS
+        ):
+            espelho.sincronizado_em = agora
+            recarregar_tabela(nome, espelho, paciente_id)
+            return espelho.df
+        if tempo_real is not None and tempo_real.em_dia(nome, espelho, usuario_id):
+            # As mudanças já chegam pela assinatura; não há nada para buscar
+            return espelho.df
+        espelho.sincronizado_em = agora
+        buscar_alteracoes(nome, espelho, paciente_id)
+        if agora - espelho.verificado_em > SINCRONIZACAO_VERIFICACAO_SEGUNDOS:
+            espelho.verificado_em = agora
+            if contar_linhas(nome, paciente_id) != len(espelho.df):
+                # Linhas apagadas sem que a cópia soubesse: só aqui a tabela é baixada de novo
+                recarregar_tabela(nome, espelho, paciente_id)
+        return espelho.df
+
+# 🧾 Consultas já feitas nesta execução do script. O Streamlit roda o arquivo do
+# zero a cada interação, então este dicionário vale só para a execução atual:
+# a mesma consulta (tabela, colunas, filtros) pedida por duas abas ou duas
+# partes da página sai uma vez só.
+consultas_da_execucao = {}
+
+def consultar_com_cache(chave, executar):
+    if chave in consultas_da_execucao:
+        resultado = consultas_da_execucao[chave]
+        # Falha já registrada nesta execução (ver consultar_em_paralelo)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+    resultado = cache_tabelas.obter(chave)
+    if resultado is None:
+        resultado = executar()
+        cache_tabelas.guardar(chave, resultado)
+    consultas_da_execucao[chave] = resultado
+    return resultado
+
+# ⚡ Consultas independentes saem ao mesmo tempo num pool de threads limitado.
+# Cada resultado (ou a exceção, em caso de falha ou tempo esgotado) fica no
+# registro da execução; quem pedir a consulta depois recebe o dado ou o erro
+# sem repetir a chamada, e carregar_tabela continua mostrando o st.error.
+CONSULTAS_SIMULTANEAS = int(os.getenv("CONSULTAS_SIMULTANEAS", "5"))
+
+@st.cache_resource
+def obter_executor_consultas():
+    return ThreadPoolExecutor(max_workers=CONSULTAS_SIMULTANEAS, thread_name_prefix="consulta")
+
+def consultar_em_paralelo(consultas):
+    executor = obter_executor_consultas()
+    pendentes = {}
+    for chave, executar in consultas.items():
+        if chave in consultas_da_execucao:
+            continue
+        resultado = cache_tabelas.obter(chave)
+        if resultado is not None:
+            consultas_da_execucao[chave] = resultado
+        else:
+            pendentes[chave] = executor.submit(executar)
+
+    limite = monotonic() + TEMPO_LIMITE_CONSULTA
+    for chave, futuro in pendentes.items():
+        try:
+            resultado = futuro.result(timeout=max(0.0, limite - monotonic()))
+        except FuturesTimeoutError:
+            resultado = TimeoutError(f"sem resposta em {TEMPO_LIMITE_CONSULTA:g}s")
+        except Exception as e:
+            resultado = e
+        else:
+            cache_tabelas.guardar(chave, resultado)
+        consultas_da_execucao[chave] = resultado
 
 # 🔗 Carregando dados reais das tabelas Supabase
 def carregar_tabela(nome):
     try:
-        response = supabase.table(nome).select("*").execute()
-        return pd.DataFrame(response.data)
+        df = consultar_com_cache((nome, paciente_id), lambda: sincronizar_tabela(nome, paciente_id, usuario_id))
     except Exception as e:
         st.error(f"Erro ao carregar '{nome}': {e}")
         return pd.DataFrame()
+    # Cópia para que ajustes de exibição não alterem o que está no cache
+    return df.copy()
+
+def carregar_tabelas(*nomes, extras=None):
+    # extras: outras consultas {chave: função} para buscar junto com as tabelas
+    consultas = {(nome, paciente_id): partial(sincronizar_tabela, nome, paciente_id, usuario_id) for nome in nomes}
+    consultas.update(extras or {})
+    with medir("carregar " + ", ".join(nomes)):
+        consultar_em_paralelo(consultas)
+    return [carregar_tabela(nome) for nome in nomes]
+
+# 🎯 Registros diários: filtros resolvidos no espelho local por um índice de
+# facetas. Para cada coluna com poucos valores distintos o índice guarda a
+# contagem de cada valor e um bitmap (um bit por linha do df, empacotado com
+# np.packbits) das linhas que têm aquele valor. Vários valores da mesma coluna
+# viram um OR dos bitmaps e colunas diferentes, um AND; o período é uma fatia
+# das posições ordenadas por dia. Linhas novas entram no fim do índice sem
+# recalculá-lo (ver atualizar_facetas); a página é recortada do resultado.
+REGISTROS_POR_PAGINA = int(os.getenv("REGISTROS_POR_PAGINA", "50"))
+# Colunas com mais valores distintos que isto (textos livres) ficam fora do índice
+FACETAS_MAX_VALORES = int(os.getenv("FACETAS_MAX_VALORES", "100"))
+COLUNAS_SEM_FACETA = ["id", "created_at", "updated_at", "paciente_id", "chave_idempotencia", "data"]
+SEM_DATA = np.iinfo(np.int64).min
+
+def dias_das_linhas(df):
+    # Dia de cada linha como inteiro (dias desde 1970); linhas sem data ficam no início
+    if "data" not in df.columns:
+        return np.full(len(df), SEM_DATA, dtype=np.int64)
+    return pd.to_datetime(df["data"], errors="coerce").to_numpy("datetime64[D]").astype(np.int64)
+
+class IndiceFacetas:
+    def __init__(self, df):
+        self.linhas = len(df)
+        self.bytes = -(-self.linhas // 8)
+        self.colunas = {}
+        self.contagens = {}
+        for coluna in df.columns.difference(COLUNAS_SEM_FACETA, sort=False):
+            codigos, valores = pd.factorize(df[coluna])
+            if len(valores) > FACETAS_MAX_VALORES:
+                continue
+            contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+            valores = valores.tolist()
+            self.colunas[coluna] = {valor: np.packbits(codigos == i) for i, valor in enumerate(valores)}
+            self.contagens[coluna] = dict(zip(valores, contagens.tolist()))
+        dias = dias_das_linhas(df)
+        self.ordem = np.argsort(dias, kind="stable")
+        self.dias_ordenados = dias[self.ordem]
+
+    def adicionar(self, novos):
+        # As linhas novas estão no fim do df (ver mesclar_linhas)
+        inicio = self.linhas
+        self.linhas += len(novos)
+        tamanho = -(-self.linhas // 8)
+        if tamanho > self.bytes:
+            # Folga para as próximas inclusões não copiarem todos os bitmaps de novo
+            self.bytes = max(tamanho, self.bytes + self.bytes // 8 + 64)
+            for bitmaps in self.colunas.values():
+                for valor, bitmap in bitmaps.items():
+                    bitmaps[valor] = np.concatenate([bitmap, np.zeros(self.bytes - len(bitmap), dtype=np.uint8)])
+        for coluna in list(self.colunas):
+            if coluna not in novos.columns:
+                continue
+            bitmaps, contagens = self.colunas[coluna], self.contagens[coluna]
+            codigos, valores = pd.factorize(novos[coluna])
+            for i, valor in enumerate(valores.tolist()):
+                posicoes = inicio + np.flatnonzero(codigos == i)
+                if valor not in bitmaps:
+                    bitmaps[valor] = np.zeros(self.bytes, dtype=np.uint8)
+                    contagens[valor] = 0
+                np.bitwise_or.at(bitmaps[valor], posicoes >> 3, (0x80 >> (posicoes & 7)).astype(np.uint8))
+                contagens[valor] += len(posicoes)
+            if len(bitmaps) > FACETAS_MAX_VALORES:
+                del self.colunas[coluna], self.contagens[coluna]
+        dias = dias_das_linhas(novos)
+        ordem = np.argsort(dias, kind="stable")
+        lugares = np.searchsorted(self.dias_ordenados, dias[ordem], side="right")
+        self.dias_ordenados = np.insert(self.dias_ordenados, lugares, dias[ordem])
+        self.ordem = np.insert(self.ordem, lugares, inicio + ordem)
+
+    def filtrar(self, filtros, periodo=None):
+        # filtros: {coluna: [valores]}. Devolve as posições das linhas no df,
+        # do dia mais recente para o mais antigo
+        inicio, fim = 0, self.linhas
+        if periodo:
+            primeiro, ultimo = (np.datetime64(dia, "D").astype(np.int64) for dia in periodo)
+            inicio = np.searchsorted(self.dias_ordenados, primeiro, side="left")
+            fim = np.searchsorted(self.dias_ordenados, ultimo, side="right")
+        posicoes = self.ordem[inicio:fim][::-1]
+        mascara = None
+        for coluna, valores in filtros.items():
+            bitmaps = self.colunas.get(coluna, {})
+            uniao = np.zeros(self.bytes, dtype=np.uint8)
+            for valor in valores:
+                if valor in bitmaps:
+                    uniao |= bitmaps[valor]
+            mascara = uniao if mascara is None else mascara & uniao
+        if mascara is not None:
+            posicoes = posicoes[np.unpackbits(mascara, count=self.linhas).astype(bool)[posicoes]]
+        return posicoes
+
+def espelho_sincronizado(nome):
+    consultar_com_cache((nome, paciente_id), lambda: sincronizar_tabela(nome, paciente_id, usuario_id))
+    espelho = espelhos.obter(nome, paciente_id)
+    if espelho.df is None:
+        # O paciente saiu da memória depois da sincronização desta execução
+        sincronizar_tabela(nome, paciente_id, usuario_id)
+    return espelho
+
+def espelho_registros():
+    return espelho_sincronizado("registros_diarios")
+
+def indice_facetas(espelho):
+    # Chamada com espelho.lock já adquirido
+    if espelho.facetas is None:
+        with medir("índice de facetas", len(espelho.df)):
+            espelho.facetas = IndiceFacetas(espelho.df)
+    return espelho.facetas
+
+def facetas_registros():
+    # Colunas do df e contagem de cada valor, copiadas para não mudarem durante
+    # a execução se uma linha nova chegar pela assinatura
+    espelho = espelho_registros()
+    with espelho.lock:
+        indice = indice_facetas(espelho)
+        return list(espelho.df.columns), {coluna: dict(c) for coluna, c in indice.contagens.items()}
+
+def pagina_registros(filtros, periodo, pagina):
+    # Devolve (DataFrame da página, total de registros filtrados, página ajustada ao total)
+    espelho = espelho_registros()
+    with espelho.lock:
+        posicoes = indice_facetas(espelho).filtrar(filtros, periodo)
+        pagina = max(0, min(pagina, (len(posicoes) - 1) // REGISTROS_POR_PAGINA))
+        inicio = pagina * REGISTROS_POR_PAGINA
+        return espelho.df.iloc[posicoes[inicio:inicio + REGISTROS_POR_PAGINA]], len(posicoes), pagina
+
+def rotulo_faceta(valor, contagem):
+    return f"{valor:g} ({contagem})" if isinstance(valor, float) else f"{valor} ({contagem})"
+
+def limpar_filtros_registros():
+    for chave in list(st.session_state):
+        if chave in ("multiselect_filtro_colunas", "date_input_periodo_registros") or str(chave).startswith("multiselect_valores_"):
+            del st.session_state[chave]
+
+def mudar_pagina_registros(passo):
+    st.session_state["pagina_registros"] = st.session_state.get("pagina_registros", 0) + passo
+
+# 🏃 Fisioterapia: quase todas as colunas são textos longos. A cópia local
+# guarda só as colunas curtas e a prévia (coluna preenchida por gatilho no
+# banco, ver COLUNAS_ESPELHO); o histórico e o gráfico de dor saem dela e o
+# texto completo de uma sessão vem só quando ela é aberta.
+COLUNAS_RESUMO_FISIOTERAPIA = [
+    "id", "data_sessao", "fisioterapeuta", "grau_dor",
+    "forca_muscular", "espasticidade", "estabilidade_motora", "previa"
+]
+CAMPOS_TEXTO_FISIOTERAPIA = {
+    "exercicios": "Exercícios Realizados",
+    "treino_marcha": "Treino de Marcha",
+    "equilibrio": "Exercícios de Equilíbrio",
+    "coordenacao": "Exercícios de Coordenação",
+    "exercicios_domiciliares": "Exercícios para Casa",
+    "amplitude_movimento": "Amplitude de Movimento (ROM)",
+    "capacidade_funcional": "Atividades de Vida Diária (AVDs)",
+    "quadro_clinico": "Quadro Clínico Motor",
+    "observacoes_paciente": "Observações do Paciente",
+    "intercorrencias": "Intercorrências",
+    "evolucao_tratamento": "Evolução do Tratamento",
+    "metas_terapeuticas": "Metas Terapêuticas",
+    "recomendacoes_familia": "Recomendações para Familiares/Cuidadores",
+}
+
+def resumo_fisioterapia():
+    espelho = espelho_sincronizado("fisioterapia")
+    with espelho.lock:
+        resumo = espelho.df.reindex(columns=COLUNAS_RESUMO_FISIOTERAPIA)
+    return resumo.sort_values(["data_sessao", "id"], ascending=False).reset_index(drop=True)
+
+def texto_sessao_fisioterapia(id_sessao):
+    def executar():
+        response = (
+            supabase.table("fisioterapia")
+            .select(*CAMPOS_TEXTO_FISIOTERAPIA)
+            .eq("id", id_sessao)
+            .execute()
+        )
+        return response.data[0] if response.data else {}
+    return consultar_com_cache(("fisioterapia", paciente_id, "sessao", id_sessao), executar)
+
+# 📈 Sinais vitais: as colunas de texto do registro diário ("120x80", "7h 30min",
+# "0".."10") viram números com operações vetorizadas do pandas, sem laço por
+# linha. Os registros são agregados por dia para calcular médias móveis,
+# variação de um dia para o outro e alertas, então o custo depende do número
+# de dias e o gráfico continua leve com anos de histórico.
+SINAIS_VITAIS = ["temperatura", "saturacao", "frequencia_cardiaca", "sistolica", "diastolica"]
+LIMITES_SINAIS_VITAIS = {
+    "temperatura": (35.5, 37.8),
+    "saturacao": (92, 100),
+    "frequencia_cardiaca": (50, 110),
+    "sistolica": (90, 140),
+    "diastolica": (60, 90),
+}
+JANELA_MEDIA_DIAS = 7
+# Desvios em relação à média dos 28 dias anteriores para marcar um valor como atípico
+LIMITE_DESVIOS_ATIPICO = 3
+
+def converter_valores_unicos(df, nome, converter):
+    # Os textos se repetem muito ("120x80", "7h 30min", "3"): a conversão roda só
+    # nos valores distintos e volta para todas as linhas pelos códigos do factorize.
+    serie = df[nome] if nome in df.columns else pd.Series(pd.NA, index=df.index, dtype="object")
+    codigos, unicos = pd.factorize(serie)
+    convertidos = converter(pd.Series(unicos, dtype="string"))
+    if isinstance(convertidos, pd.Series):
+        convertidos = convertidos.to_frame()
+    convertidos = convertidos.apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+    # Linha extra de NaN no fim: o código -1 (valor vazio) aponta para ela
+    convertidos = np.vstack([convertidos, np.full((1, convertidos.shape[1]), np.nan)])
+    return pd.DataFrame(convertidos[codigos], index=df.index)
+
+def coluna_numerica(df, nome):
+    if nome in df.columns and pd.api.types.is_numeric_dtype(df[nome]):
+        return df[nome].astype("float64")
+    return converter_valores_unicos(df, nome, lambda textos: textos.str.replace(",", ".")).iloc[:, 0]
+
+def preparar_sinais_vitais(df):
+    sinais = pd.DataFrame(index=df.index)
+    datas = df["data"] if "data" in df.columns else pd.Series(pd.NA, index=df.index)
+    sinais["data"] = pd.to_datetime(datas, errors="coerce")
+    sinais["temperatura"] = coluna_numerica(df, "temperatura")
+    sinais["saturacao"] = coluna_numerica(df, "saturacao")
+    sinais["frequencia_cardiaca"] = coluna_numerica(df, "frequencia_cardiaca")
+
+    pressao = converter_valores_unicos(
+        df, "pressao", lambda textos: textos.str.extract(r"(\d{2,3})\s*[xX/]\s*(\d{2,3})")
+    )
+    sinais["sistolica"] = pressao[0]
+    sinais["diastolica"] = pressao[1]
+
+    sono = converter_valores_unicos(df, "sono", lambda textos: textos.str.extract(r"(\d+)\s*h(?:\s*(\d+)\s*min)?"))
+    sinais["sono_minutos"] = sono[0] * 60 + sono[1].fillna(0)
+
+    sinais["evacuacoes"] = coluna_numerica(df, "quantidade_feze")
+    sinais["miccoes"] = coluna_numerica(df, "quantidade_urina")
+    return sinais.dropna(subset=["data"])
+
+def analisar_sinais_vitais(diario):
+    # diario: médias por dia (ver medias_agregadas)
+    # Colunas em dois níveis: (valor | media | variacao | fora_da_faixa | atipico, sinal)
+    diario = diario.asfreq("D")
+    vitais = diario[SINAIS_VITAIS]
+
+    minimos = pd.Series({c: LIMITES_SINAIS_VITAIS[c][0] for c in SINAIS_VITAIS})
+    maximos = pd.Series({c: LIMITES_SINAIS_VITAIS[c][1] for c in SINAIS_VITAIS})
+    fora_da_faixa = vitais.lt(minimos) | vitais.gt(maximos)
+
+    historico = vitais.rolling(4 * JANELA_MEDIA_DIAS, min_periods=JANELA_MEDIA_DIAS)
+    desvios = (vitais - historico.mean().shift(1)) / historico.std().shift(1)
+    atipico = desvios.abs() > LIMITE_DESVIOS_ATIPICO
+
+    return pd.concat({
+        "valor": diario,
+        "media": diario.rolling(JANELA_MEDIA_DIAS, min_periods=1).mean(),
+        "variacao": vitais.diff(),
+        "fora_da_faixa": fora_da_faixa,
+        "atipico": atipico,
+    }, axis=1)
+
+def alertas_sinais_vitais(analise):
+    # Uma linha por (dia, sinal) fora da faixa ou atípico
+    sinalizados = analise["fora_da_faixa"] | analise["atipico"]
+    valores = analise["valor"][SINAIS_VITAIS].where(sinalizados).stack()
+    if valores.empty:
+        return pd.DataFrame(columns=["dia", "sinal", "valor", "motivo"])
+    alertas = valores.rename("valor").reset_index()
+    alertas.columns = ["dia", "sinal", "valor"]
+    fora = analise["fora_da_faixa"].stack().reindex(pd.MultiIndex.from_frame(alertas[["dia", "sinal"]]))
+    alertas["motivo"] = pd.Series(fora.to_numpy(), index=alertas.index).map({True: "fora da faixa", False: "atípico"})
+    return alertas.sort_values("dia", ascending=False)
+
+def sinais_vitais_analisados():
+    def executar():
+        diario = medias_agregadas("registros_diarios")
+        if diario.empty:
+            return pd.DataFrame()
+        with medir("sinais vitais", len(diario)):
+            return analisar_sinais_vitais(diario)
+
+    return consultar_com_cache(("registros_diarios", paciente_id, "sinais_vitais"), executar)
+
+# 📊 Agregados por dia de cada métrica (soma e contagem), guardados junto com a
+# cópia local de cada tabela. Linhas novas somam a sua parte, linhas alteradas ou
+# apagadas descontam a versão antiga, e só uma carga completa recalcula tudo.
+# Semanas saem somando os dias. Gráficos e análises leem só os agregados, então
+# o custo de uma tendência depende do número de dias e não de registros.
+METRICAS_SEM_LINHAS = {
+    "alimentacao": OPCOES_REFEICAO,
+    "fisioterapia": ["grau_dor"],
+}
+
+def metricas_das_linhas(nome, df):
+    # Devolve (dia de cada linha, uma coluna por métrica com NaN onde não há valor)
+    if nome == "registros_diarios":
+        sinais = preparar_sinais_vitais(df)
+        return sinais["data"].dt.normalize(), sinais.drop(columns="data")
+    if nome == "alimentacao" and {"created_at", "refeicao", "aceitou"} <= set(df.columns):
+        # Aceitação de cada tipo de refeição: 1 aceitou, 0 não, NaN outra refeição
+        aceitou = (df["aceitou"] == "Sim").astype("float64")
+        refeicoes = df["refeicao"].dropna().unique()
+        valores = pd.DataFrame({str(r): aceitou.where(df["refeicao"] == r) for r in refeicoes}, index=df.index)
+        dias = pd.to_datetime(df["created_at"], utc=True).dt.tz_localize(None).dt.normalize()
+        return dias, valores
+    if nome == "fisioterapia" and {"data_sessao", "grau_dor"} <= set(df.columns):
+        return df["data_sessao"].dt.normalize(), df[["grau_dor"]].astype("float64")
+    # Sem as colunas (paciente sem nenhuma linha ainda): métricas da tabela sem valores,
+    # para os agregados e as médias terem as colunas que os gráficos esperam
+    metricas = METRICAS_SEM_LINHAS.get(nome, [])
+    return (
+        pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]"),
+        pd.DataFrame(np.nan, index=df.index, columns=metricas, dtype="float64"),
+    )
+
+def contribuicao_diaria(nome, df):
+    dias, valores = metricas_das_linhas(nome, df)
+    grupos = valores.groupby(dias)
+    return pd.concat({"soma": grupos.sum(), "n": grupos.count()}, axis=1)
+
+def atualizar_agregados(nome, espelho, novos, antigos):
+    # Ainda não calculados: serão montados do df inteiro na primeira leitura
+    if espelho.agregados is None:
+        return
+    agregados = espelho.agregados
+    if antigos is not None and not antigos.empty:
+        agregados = agregados.sub(contribuicao_diaria(nome, antigos), fill_value=0)
+    if novos is not None and not novos.empty:
+        agregados = agregados.add(contribuicao_diaria(nome, novos), fill_value=0)
+    espelho.agregados = agregados[agregados["n"].sum(axis=1) > 0].sort_index()
+
+def agregados_diarios(nome):
+    espelho = espelho_sincronizado(nome)
+    with espelho.lock:
+        if espelho.agregados is None:
+            with medir(f"agregados {nome}", len(espelho.df)):
+                espelho.agregados = contribuicao_diaria(nome, espelho.df)
+        return espelho.agregados
+
+def medias_agregadas(nome, por="dia"):
+    # Média de cada métrica por dia ou por semana (começando na segunda-feira)
+    agregados = agregados_diarios(nome)
+    if por == "semana" and not agregados.empty:
+        agregados = agregados.resample("W-MON", label="left", closed="left").sum()
+    return agregados["soma"].where(agregados["n"] > 0) / agregados["n"]
+
+# ⏰ Agenda dos medicamentos: cada prescrição (frequência + horário da primeira
+# dose) vira a lista de horários previstos, e cada horário, um intervalo em que
+# uma administração conta para aquela dose. Os intervalos de todos os
+# medicamentos entram num único IntervalIndex (a linha do tempo de cada
+# medicamento fica numa faixa própria, sem encostar na dos outros) e todas as
+# administrações do período são casadas com as doses numa só chamada de
+# get_indexer, sem laço por medicamento ou por dose.
+FUSO_HORARIO = ZoneInfo(os.getenv("FUSO_HORARIO", "America/Sao_Paulo"))
+# Horas depois do horário da primeira dose em que cada frequência prevê uma dose
+HORAS_DAS_DOSES = {
+    "1x ao dia": [0],
+    "2x ao dia": [0, 12],
+    "3x ao dia": [0, 8, 16],
+    "A cada 8h": [0, 8, 16],
+    "Sob demanda": [],
+}
+TOLERANCIA_DOSE_MINUTOS = int(os.getenv("TOLERANCIA_DOSE_MINUTOS", "60"))
+# Sem administração até aqui (ou até a dose seguinte), a dose conta como perdida
+ATRASO_MAXIMO_DOSE_MINUTOS = int(os.getenv("ATRASO_MAXIMO_DOSE_MINUTOS", "240"))
+HORAS_INICIO_PLANTAO = sorted(int(h) for h in os.getenv("HORAS_INICIO_PLANTAO", "7,19").split(","))
+DOSE_NO_HORARIO = "✅ No horário"
+DOSE_COM_ATRASO = "🕒 Com atraso"
+DOSE_A_ADMINISTRAR = "⏳ A administrar"
+DOSE_ATRASADA = "⚠️ Atrasada"
+DOSE_PERDIDA = "❌ Perdida"
+
+def hora_local(serie):
+    # Horários do banco (UTC) no fuso do paciente, sem fuso, para comparar com a agenda
+    return pd.to_datetime(serie, utc=True).dt.tz_convert(FUSO_HORARIO).dt.tz_localize(None)
+
+def agora_local():
+    return pd.Timestamp.now(tz=FUSO_HORARIO).tz_localize(None)
+
+def plantao_atual(agora):
+    # Os plantões começam nas HORAS_INICIO_PLANTAO de cada dia (7h e 19h: dois de 12h)
+    inicios = [agora.normalize() + pd.Timedelta(days=d, hours=h) for d in (-1, 0, 1) for h in HORAS_INICIO_PLANTAO]
+    return max(i for i in inicios if i <= agora), min(i for i in inicios if i > agora)
+
+def doses_previstas(medicamentos, inicio, fim):
+    # Uma linha por (medicamento, horário previsto) em [inicio, fim), em hora local
+    colunas = ["medicamento_id", "prevista"]
+    if medicamentos.empty or not {"id", "frequencia", "horario"} <= set(medicamentos.columns):
+        return pd.DataFrame({"medicamento_id": pd.Series(dtype="int64"), "prevista": pd.Series(dtype="datetime64[ns]")})
+    prescricoes = pd.DataFrame({
+        "medicamento_id": medicamentos["id"].astype("int64"),
+        "primeira": pd.to_timedelta(medicamentos["horario"].astype(str).str.strip() + ":00", errors="coerce"),
+        "desde": hora_local(medicamentos["created_at"]) if "created_at" in medicamentos.columns else pd.NaT,
+        "horas": medicamentos["frequencia"].astype(str).map(HORAS_DAS_DOSES),
+        # fim é o último dia da prescrição (inclusive)
+        "ate": pd.to_datetime(medicamentos["fim"]) + pd.Timedelta(days=1) if "fim" in medicamentos.columns else pd.NaT,
+    })
+    # Prescrições suspensas (ativo = false) não têm doses previstas
+    if "ativo" in medicamentos.columns:
+        prescricoes = prescricoes[medicamentos["ativo"].astype("boolean").fillna(True).to_numpy()]
+    # "Sob demanda" (lista vazia) e frequências desconhecidas não têm doses previstas
+    prescricoes = prescricoes.explode("horas").dropna(subset=["horas"])
+    prescricoes["primeira"] = prescricoes["primeira"].fillna(pd.Timedelta(hours=8))
+    # Começa um dia antes: a dose das 20h + 12h cai no dia seguinte
+    dias = pd.DataFrame({"dia": pd.date_range(inicio.normalize() - pd.Timedelta(days=1), fim.normalize(), freq="D")})
+    doses = prescricoes.merge(dias, how="cross")
+    doses["prevista"] = doses["dia"] + doses["primeira"] + pd.to_timedelta(doses["horas"].astype("int64"), unit="h")
+    dentro = (
+        (doses["prevista"] >= inicio) & (doses["prevista"] < fim)
+        & ~(doses["prevista"] < doses["desde"]) & ~(doses["prevista"] >= doses["ate"])
+    )
+    return doses.loc[dentro, colunas].sort_values(colunas, ignore_index=True)
+
+def conciliar_doses(previstas, administracoes, agora):
+    # previstas: medicamento_id, prevista (ordenadas); administracoes: medicamento_id, administrado_em (hora local).
+    # Devolve (doses com administrada_em e situacao, administrações que não contaram como dose).
+    # Nas que sobram, repetida marca uma segunda administração dentro da janela de uma dose já dada
+    tolerancia = pd.Timedelta(minutes=TOLERANCIA_DOSE_MINUTOS)
+    doses = previstas.reset_index(drop=True)
+    if doses.empty:
+        doses = doses.assign(administrada_em=pd.Series(dtype="datetime64[ns]"), situacao=pd.Series(dtype="object"))
+        return doses, administracoes.assign(repetida=False)
+    inicio_janela = doses["prevista"] - tolerancia
+    fim_janela = doses["prevista"] + pd.Timedelta(minutes=ATRASO_MAXIMO_DOSE_MINUTOS)
+    # A janela de uma dose termina onde começa a da dose seguinte do mesmo medicamento
+    proxima = inicio_janela.shift(-1)
+    mesma = doses["medicamento_id"].shift(-1) == doses["medicamento_id"]
+    fim_janela = fim_janela.where(~mesma | (fim_janela <= proxima), proxima)
+
+    # Segundos desde a origem; cada medicamento ocupa a sua faixa [código * faixa, (código + 1) * faixa)
+    medicamentos = pd.Index(doses["medicamento_id"].unique())
+    origem = inicio_janela.min()
+    faixa = int((fim_janela.max() - origem).total_seconds()) + 1
+    segundos = lambda horas: ((horas - origem) // pd.Timedelta(seconds=1)).to_numpy(dtype="int64")
+    codigos = medicamentos.get_indexer(doses["medicamento_id"]).astype("int64") * faixa
+    intervalos = pd.IntervalIndex.from_arrays(
+        codigos + segundos(inicio_janela), codigos + segundos(fim_janela), closed="left"
+    )
+
+    candidatas = administracoes[
+        administracoes["medicamento_id"].isin(medicamentos)
+        & (administracoes["administrado_em"] >= origem)
+        & (administracoes["administrado_em"] < fim_janela.max())
+    ]
+    posicoes = intervalos.get_indexer(
+        medicamentos.get_indexer(candidatas["medicamento_id"]).astype("int64") * faixa
+        + segundos(candidatas["administrado_em"])
+    )
+    # Duas administrações na mesma janela: a primeira conta como a dose, as outras são repetidas
+    casadas = np.flatnonzero(posicoes >= 0)
+    horas_casadas = pd.Series(candidatas["administrado_em"].to_numpy()[casadas])
+    primeiras = horas_casadas.groupby(posicoes[casadas]).idxmin()
+    doses["administrada_em"] = pd.Series(horas_casadas[primeiras].to_numpy(), index=primeiras.index).reindex(doses.index)
+
+    administrada = doses["administrada_em"].notna()
+    doses["situacao"] = np.select(
+        [
+            administrada & (doses["administrada_em"] <= doses["prevista"] + tolerancia),
+            administrada,
+            agora < doses["prevista"] + tolerancia,
+            agora < fim_janela,
+        ],
+        [DOSE_NO_HORARIO, DOSE_COM_ATRASO, DOSE_A_ADMINISTRAR, DOSE_ATRASADA],
+        DOSE_PERDIDA,
+    )
+    contadas = candidatas.index[casadas[primeiras.to_numpy()]]
+    repetidas = candidatas.index[casadas].difference(contadas)
+    sobras = administracoes.drop(index=contadas)
+    return doses, sobras.assign(repetida=sobras.index.isin(repetidas))
+
+def agenda_medicamentos(medicamentos, administracoes, inicio, fim, agora):
+    previstas = doses_previstas(medicamentos, inicio, fim)
+    # Só as administrações que podem cair na janela de alguma dose do período
+    limite_inicio = (inicio - pd.Timedelta(minutes=TOLERANCIA_DOSE_MINUTOS)).tz_localize(FUSO_HORARIO, nonexistent="shift_forward")
+    limite_fim = (fim + pd.Timedelta(minutes=ATRASO_MAXIMO_DOSE_MINUTOS)).tz_localize(FUSO_HORARIO, nonexistent="shift_forward")
+    if administracoes.empty or "administrado_em" not in administracoes.columns:
+        administracoes = pd.DataFrame({"administrado_em": pd.Series(dtype="datetime64[ns, UTC]"), "medicamento_id": pd.Series(dtype="Int64")})
+    horas = administracoes["administrado_em"]
+    no_periodo = administracoes[(horas >= limite_inicio) & (horas < limite_fim)].dropna(subset=["medicamento_id"])
+    # Os medicamentos marcados no registro diário dizem só que foram dados no dia, não
+    # a que dose correspondem: ficam fora da agenda (as doses vêm do botão "Registrar dose")
+    if "registro_id" in no_periodo.columns:
+        no_periodo = no_periodo[no_periodo["registro_id"].isna()]
+    no_periodo = pd.DataFrame({
+        "medicamento_id": no_periodo["medicamento_id"].astype("int64"),
+        "administrado_em": hora_local(no_periodo["administrado_em"]),
+    })
+    return conciliar_doses(previstas, no_periodo, agora)
+
+def adesao_medicamentos(doses, avulsas):
+    # Por medicamento: doses encerradas (administradas ou perdidas) e a adesão sobre elas
+    encerradas = doses[doses["situacao"].isin([DOSE_NO_HORARIO, DOSE_COM_ATRASO, DOSE_PERDIDA])]
+    tabela = pd.crosstab(encerradas["medicamento_id"], encerradas["situacao"]).reindex(
+        columns=[DOSE_NO_HORARIO, DOSE_COM_ATRASO, DOSE_PERDIDA], fill_value=0
+    )
+    tabela.columns = ["No horário", "Com atraso", "Perdidas"]
+    tabela["Previstas"] = tabela.sum(axis=1)
+    tabela["Adesão (%)"] = (100 * (tabela["No horário"] + tabela["Com atraso"]) / tabela["Previstas"]).round(1)
+    tabela = tabela.join(avulsas.loc[~avulsas["repetida"], "medicamento_id"].value_counts().rename("Fora da agenda"), how="outer")
+    tabela = tabela.join(avulsas.loc[avulsas["repetida"], "medicamento_id"].value_counts().rename("Repetidas"), how="outer")
+    return tabela.fillna({"No horário": 0, "Com atraso": 0, "Perdidas": 0, "Previstas": 0, "Fora da agenda": 0, "Repetidas": 0})
+
+def exibir_tabela(nome, df, **opcoes):
+    with medir(f"st.dataframe {nome}", len(df)):
+        return st.dataframe(df, **opcoes)
+
+# 📥 Exportação: as linhas saem em lotes de EXPORTACAO_LOTE, paginados pela
+# chave (data, id) em ordem crescente, e cada lote vai para o arquivo (CSV ou
+# Parquet) antes de o próximo ser buscado. Só um lote fica em memória, não
+# importa o tamanho do período. O relatório clínico lê as tabelas do mesmo
+# jeito, mas guarda só os totais por dia.
+# No máximo o max-rows do PostgREST (1000 no Supabase), senão cada lote vem cortado nele
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "1000"))
+COLUNAS_INTERNAS_EXPORTACAO = ["paciente_id", "chave_idempotencia"]
 
-df_registros = carregar_tabela("registros_diarios")
-# st.write("Dados retornados:", df_registros)  # Removido para produção
-if not df_registros.empty and "data" in df_registros.columns:
-    df_registros["data"] = pd.to_datetime(df_registros["data"]).dt.strftime("%d/%m/%Y")
+def ler_em_lotes(nome, periodo, colunas=("*",)):
+    coluna_data = COLUNAS_PARTICAO.get(nome, "created_at")
 
-df_cuidadores = carregar_tabela("cuidadores")
-df_medicamentos = carregar_tabela("medicamentos")
-df_alimentacao = carregar_tabela("alimentacao")
+    def nova_consulta():
+        consulta = supabase.table(nome).select(*colunas).eq("paciente_id", paciente_id)
+        if periodo:
+            inicio, fim = periodo[0], periodo[1] + timedelta(days=1)
+            if ESQUEMAS.get(nome, {}).get(coluna_data) == "data_hora":
+                # Dias do período no fuso do paciente, não em UTC
+                inicio, fim = (pd.Timestamp(d).tz_localize(FUSO_HORARIO).tz_convert("UTC") for d in (inicio, fim))
+            consulta = consulta.gte(coluna_data, inicio.isoformat()).lt(coluna_data, fim.isoformat())
+        return consulta
 
-abas = st.tabs(["📋 Registros Diários", "🧑‍⚕️ Cuidadores", "💊 Medicamentos", "🍽️ Alimentação", "🏃 Fisioterapia"])
+    yield from paginar(nova_consulta, coluna_data, EXPORTACAO_LOTE)
+
+def exportar_tabela(nome, periodo, formato, destino):
+    linhas = 0
+    escritor = None
+    # Em Parquet quem abre o arquivo é o ParquetWriter, no primeiro lote
+    arquivo_csv = open(destino, "w", encoding="utf-8-sig", newline="") if formato == "csv" else None
+    try:
+        for dados in ler_em_lotes(nome, periodo):
+            with medir(f"exportar {nome}", len(dados)):
+                lote = aplicar_esquema(nome, pd.DataFrame(dados))
+                lote = lote.drop(columns=COLUNAS_INTERNAS_EXPORTACAO, errors="ignore")
+                if arquivo_csv is not None:
+                    lote.to_csv(arquivo_csv, header=linhas == 0, index=False)
+                else:
+                    # Categorias de um lote podem diferir das do outro: no arquivo vão como texto
+                    categorias = lote.select_dtypes("category").columns
+                    lote = lote.astype({coluna: "string[pyarrow]" for coluna in categorias})
+                    tabela = pa.Table.from_pandas(lote, preserve_index=False)
+                    if escritor is None:
+                        # Coluna toda vazia no primeiro lote vira texto, senão os próximos não encaixam
+                        esquema = pa.schema([
+                            campo.with_type(pa.string()) if pa.types.is_null(campo.type) else campo
+                            for campo in tabela.schema
+                        ])
+                        escritor = pq.ParquetWriter(destino, esquema)
+                    escritor.write_table(tabela.cast(escritor.schema))
+            linhas += len(dados)
+    finally:
+        if escritor is not None:
+            escritor.close()
+        if arquivo_csv is not None:
+            arquivo_csv.close()
+    return linhas
+
+def somar_parciais(total, parcial):
+    return parcial if total is None else total.add(parcial, fill_value=0)
+
+def relatorio_clinico(periodo):
+    # Devolve {seção: DataFrame}; o que fica em memória cresce com os dias do
+    # período e o número de medicamentos, não com a quantidade de registros
+    somas_vitais = contagens_vitais = None
+    colunas_registros = ("id", "data", "temperatura", "saturacao", "frequencia_cardiaca",
+                         "pressao", "sono", "quantidade_feze", "quantidade_urina")
+    for dados in ler_em_lotes("registros_diarios", periodo, colunas_registros):
+        sinais = preparar_sinais_vitais(aplicar_esquema("registros_diarios", pd.DataFrame(dados)))
+        grupos = sinais.drop(columns="data").groupby(sinais["data"].dt.normalize())
+        somas_vitais = somar_parciais(somas_vitais, grupos.sum())
+        contagens_vitais = somar_parciais(contagens_vitais, grupos.count())
+
+    refeicoes = aceitas_por_dia = refeicoes_por_dia = None
+    for dados in ler_em_lotes("alimentacao", periodo, ("id", "created_at", "refeicao", "aceitou")):
+        lote = aplicar_esquema("alimentacao", pd.DataFrame(dados))
+        refeicoes = somar_parciais(refeicoes, pd.crosstab(lote["refeicao"], lote["aceitou"]))
+        dias = hora_local(lote["created_at"]).dt.normalize()
+        refeicoes_por_dia = somar_parciais(refeicoes_por_dia, dias.value_counts())
+        aceitas_por_dia = somar_parciais(aceitas_por_dia, dias[lote["aceitou"] == "Sim"].value_counts())
+
+    df_medicamentos = carregar_tabela("medicamentos")
+    doses = None
+    if not df_medicamentos.empty:
+        for dados in ler_em_lotes("administracoes_medicamentos", periodo, ("id", "medicamento_id", "administrado_em")):
+            doses = somar_parciais(doses, pd.DataFrame(dados)["medicamento_id"].value_counts())
+
+    somas_dor = contagens_dor = None
+    intercorrencias = []
+    for dados in ler_em_lotes("fisioterapia", periodo, ("id", "data_sessao", "grau_dor", "intercorrencias")):
+        lote = aplicar_esquema("fisioterapia", pd.DataFrame(dados))
+        grupos = lote["grau_dor"].astype("float64").groupby(lote["data_sessao"].dt.normalize())
+        somas_dor = somar_parciais(somas_dor, grupos.sum())
+        contagens_dor = somar_parciais(contagens_dor, grupos.count())
+        com_intercorrencia = lote[lote["intercorrencias"].fillna("").str.strip() != ""]
+        intercorrencias.append(com_intercorrencia[["data_sessao", "intercorrencias"]])
+
+    secoes = {}
+    diario = pd.DataFrame()
+    if somas_vitais is not None:
+        vitais = somas_vitais / contagens_vitais.replace(0, np.nan)
+        vitais["sono_minutos"] = vitais["sono_minutos"] / 60
+        diario = vitais.rename(columns={
+            "temperatura": "Temperatura (°C)", "saturacao": "Saturação (%)",
+            "frequencia_cardiaca": "Frequência Cardíaca (bpm)", "sistolica": "Sistólica (mmHg)",
+            "diastolica": "Diastólica (mmHg)", "sono_minutos": "Sono (h)",
+            "evacuacoes": "Evacuações", "miccoes": "Micções",
+        })
+        resumo = vitais[SINAIS_VITAIS].agg(["mean", "min", "max"]).T
+        resumo.columns = ["Média diária", "Menor média diária", "Maior média diária"]
+        minimos = pd.Series({c: LIMITES_SINAIS_VITAIS[c][0] for c in SINAIS_VITAIS})
+        maximos = pd.Series({c: LIMITES_SINAIS_VITAIS[c][1] for c in SINAIS_VITAIS})
+        resumo["Dias fora da faixa"] = (vitais[SINAIS_VITAIS].lt(minimos) | vitais[SINAIS_VITAIS].gt(maximos)).sum()
+        secoes["Sinais vitais"] = resumo
+    if refeicoes_por_dia is not None:
+        diario = diario.join(
+            pd.DataFrame({"Refeições": refeicoes_por_dia, "Refeições aceitas": aceitas_por_dia}).fillna(0),
+            how="outer"
+        )
+        refeicoes = refeicoes.rename_axis(index="Refeição", columns=None)
+        refeicoes["Total"] = refeicoes.sum(axis=1)
+        refeicoes["Aceitação (%)"] = 100 * refeicoes.get("Sim", 0) / refeicoes["Total"]
+        secoes["Alimentação"] = refeicoes
+    if not df_medicamentos.empty:
+        prescritos = df_medicamentos.set_index("id")[["nome", "dosagem", "frequencia", "horario"]]
+        prescritos["Doses registradas"] = (doses if doses is not None else pd.Series(dtype="float64")).reindex(prescritos.index).fillna(0).astype(int)
+        secoes["Medicamentos"] = prescritos.rename(columns={
+            "nome": "Medicamento", "dosagem": "Dosagem", "frequencia": "Frequência", "horario": "Horário"
+        }).set_index("Medicamento")
+    if somas_dor is not None:
+        diario = diario.join((somas_dor / contagens_dor.replace(0, np.nan)).rename("Dor (fisioterapia)"), how="outer")
+        secoes["Fisioterapia"] = pd.DataFrame({
+            "Sessões": [int(contagens_dor.sum())],
+            "Dor média": [somas_dor.sum() / max(contagens_dor.sum(), 1)],
+        })
+        intercorrencias = pd.concat(intercorrencias)
+        if not intercorrencias.empty:
+            secoes["Intercorrências"] = intercorrencias.rename(
+                columns={"data_sessao": "Data", "intercorrencias": "Intercorrência"}
+            ).set_index("Data")
+    if not diario.empty:
+        diario.index = pd.to_datetime(diario.index).strftime("%d/%m/%Y")
+        diario.index.name = "Dia"
+        secoes["Por dia"] = diario
+    return secoes
+
+def relatorio_html(secoes, periodo):
+    descricao = (
+        f"{periodo[0]:%d/%m/%Y} a {periodo[1]:%d/%m/%Y}" if periodo else "histórico completo"
+    )
+    partes = [
+        "<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'>",
+        f"<title>Relatório clínico — {html.escape(paciente)}</title>",
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:1.5em}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:right}th{background:#f3f3f3}"
+        "@media print{h2{page-break-before:auto}}</style></head><body>",
+        f"<h1>🩺 Relatório clínico — {html.escape(paciente)}</h1>",
+        f"<p>Período: {descricao}. Gerado em {datetime.now():%d/%m/%Y %H:%M}.</p>",
+    ]
+    if not secoes:
+        partes.append("<p>Nenhum registro no período.</p>")
+    for titulo, tabela in secoes.items():
+        partes.append(f"<h2>{html.escape(titulo)}</h2>")
+        partes.append(tabela.to_html(float_format=lambda v: f"{v:.1f}", na_rep="—"))
+    partes.append("</body></html>")
+    return "".join(partes)
+
+# 📤 Caixa de saída local: os formulários gravam primeiro num SQLite (o que é
+# instantâneo e sobrevive a uma queda do Wi-Fi) e uma thread envia os pendentes
+# ao Supabase em lotes. Cada linha leva uma chave_idempotencia única; o envio é
+# um upsert que ignora chaves repetidas, então reenviar nunca duplica registros.
+# Cada linha é enviada com a sessão de quem a salvou (o RLS do banco vale para
+# o autor): as sessões abertas se registram a cada execução com o token em dia,
+# e linhas de um autor sem sessão válida (app reiniciado, token vencido) esperam
+# na fila até ele voltar a abrir o app.
+# Se o banco recusar um lote por causa dos dados (chave estrangeira, valor
+# inválido), o lote é dividido ao meio até isolar as linhas com problema; as
+# que continuam sendo recusadas saem da fila e aparecem na tela para revisão.
+CAIXA_SAIDA_ARQUIVO = os.getenv("CAIXA_SAIDA_ARQUIVO", ".caixa_saida.sqlite3")
+CAIXA_SAIDA_LOTE = int(os.getenv("CAIXA_SAIDA_LOTE", "50"))
+CAIXA_SAIDA_INTERVALO_SEGUNDOS = float(os.getenv("CAIXA_SAIDA_INTERVALO_SEGUNDOS", "5"))
+CAIXA_SAIDA_TENTATIVAS_MAXIMAS = int(os.getenv("CAIXA_SAIDA_TENTATIVAS_MAXIMAS", "3"))
+
+def erro_dos_dados(erro):
+    # Classes 22 (dado inválido) e 23 (restrição violada) do Postgres e corpo
+    # rejeitado pelo PostgREST: a mesma linha vai falhar de novo. Token vencido,
+    # falta de permissão e erro do servidor valem para o lote inteiro.
+    codigo = str(getattr(erro, "code", None) or "")
+    return isinstance(erro, APIError) and (codigo[:2] in ("22", "23") or codigo in ("PGRST102", "PGRST204"))
+
+class CaixaSaida:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # usuario -> (cliente, access_token) da sessão mais recente desse usuário
+        self.sessoes = {}
+        self._lock = threading.Lock()
+        self.acordar = threading.Event()
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute("""
+                create table if not exists pendentes (
+                    id integer primary key autoincrement,
+                    tabela text not null,
+                    dados text not null,
+                    criado_em real not null,
+                    tentativas integer not null default 0,
+                    erro text,
+                    recusado integer not null default 0,
+                    usuario text
+                )
+            """)
+            # Arquivos criados antes da quarentena de linhas recusadas
+            colunas = {linha[1] for linha in conexao.execute("pragma table_info(pendentes)")}
+            if "recusado" not in colunas:
+                conexao.execute("alter table pendentes add column recusado integer not null default 0")
+            # Linhas antigas, sem autor, saem com a sessão de qualquer usuário
+            if "usuario" not in colunas:
+                conexao.execute("alter table pendentes add column usuario text")
+        threading.Thread(target=self._laco, name="caixa-saida", daemon=True).start()
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        conexao.execute("pragma journal_mode=wal")
+        return conexao
+
+    def registrar_sessao(self, cliente, token):
+        usuario = usuario_do_token(token)
+        if usuario is None:
+            return
+        with self._lock:
+            anterior = self.sessoes.get(usuario)
+            self.sessoes[usuario] = (cliente, token)
+        # Sessão nova ou token renovado: pode haver linhas desse usuário esperando
+        if anterior is None or anterior[1] != token:
+            self.acordar.set()
+
+    def enfileirar(self, tabela, dados, token):
+        dados = dict(dados, chave_idempotencia=str(uuid.uuid4()))
+        # default: ids vindos do pandas chegam como numpy.int64
+        texto = json.dumps(dados, default=lambda v: v.item() if hasattr(v, "item") else str(v))
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                "insert into pendentes (tabela, dados, criado_em, usuario) values (?, ?, ?, ?)",
+                (tabela, texto, datetime.now().timestamp(), usuario_do_token(token))
+            )
+        self.acordar.set()
+
+    def _sessoes_validas(self):
+        with self._lock:
+            sessoes = list(self.sessoes.items())
+        return {usuario: cliente for usuario, (cliente, token) in sessoes if segundos_ate_expirar(token) > 0}
+
+    def quantidade_pendente(self, usuario=None):
+        # usuario=None conta a fila de todos os usuários do processo
+        with closing(self._conectar()) as conexao:
+            if usuario is None:
+                return conexao.execute("select count(*) from pendentes where recusado = 0").fetchone()[0]
+            return conexao.execute(
+                "select count(*) from pendentes where recusado = 0 and usuario = ?", (usuario,)
+            ).fetchone()[0]
+
+    def pendentes(self, tabela):
+        with closing(self._conectar()) as conexao:
+            return conexao.execute(
+                "select id, dados, criado_em from pendentes where recusado = 0 and tabela = ? order by id", (tabela,)
+            ).fetchall()
+
+    def recusados(self):
+        with closing(self._conectar()) as conexao:
+            return conexao.execute(
+                "select id, tabela, dados, criado_em, erro from pendentes where recusado = 1 order by id"
+            ).fetchall()
+
+    def reenviar(self, id_pendente):
+        # Depois de corrigir o problema no banco (ex.: o medicamento que faltava)
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                "update pendentes set recusado = 0, tentativas = 0, erro = null where id = ?", (id_pendente,)
+            )
+        self.acordar.set()
+
+    def descartar(self, id_pendente):
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute("delete from pendentes where id = ? and recusado = 1", (id_pendente,))
+
+    def _laco(self):
+        espera = CAIXA_SAIDA_INTERVALO_SEGUNDOS
+        while True:
+            self.acordar.wait(espera)
+            self.acordar.clear()
+            try:
+                # Lote cheio: provavelmente tem mais na fila, então segue enviando
+                while self.enviar_lote() == CAIXA_SAIDA_LOTE:
+                    pass
+                espera = CAIXA_SAIDA_INTERVALO_SEGUNDOS
+            except Exception:
+                # Fica tudo na fila; tenta de novo esperando cada vez mais
+                espera = min(espera * 2, 300)
+
+    def enviar_lote(self):
+        sessoes = self._sessoes_validas()
+        if not sessoes:
+            return 0
+        with closing(self._conectar()) as conexao:
+            linhas = conexao.execute(
+                # Só linhas de quem tem sessão válida (ou sem autor). Itens que
+                # já falharam vão para o fim, para não travar os novos
+                f"""select id, tabela, dados, usuario from pendentes
+                where recusado = 0 and (usuario is null or usuario in ({",".join("?" * len(sessoes))}))
+                order by tentativas, id limit ?""",
+                (*sessoes, CAIXA_SAIDA_LOTE)
+            ).fetchall()
+
+        por_tabela = {}
+        for id_pendente, tabela, dados, usuario in linhas:
+            cliente = sessoes.get(usuario) or next(iter(sessoes.values()))
+            por_tabela.setdefault((tabela, cliente), []).append((id_pendente, json.loads(dados)))
+
+        enviados = 0
+        falha = None
+        for (tabela, cliente), itens in por_tabela.items():
+            ids = [id_pendente for id_pendente, _ in itens]
+            try:
+                enviados_ids = self._enviar_partes(cliente, tabela, itens)
+            except Exception as e:
+                with closing(self._conectar()) as conexao, conexao:
+                    conexao.executemany(
+                        "update pendentes set tentativas = tentativas + 1, erro = ? where id = ?",
+                        [(str(e), id_pendente) for id_pendente in ids]
+                    )
+                falha = falha or e
+                continue
+
+            if enviados_ids:
+                with closing(self._conectar()) as conexao, conexao:
+                    conexao.executemany("delete from pendentes where id = ?", [(i,) for i in enviados_ids])
+                cache_tabelas.invalidar(tabela)
+                if tabela == "registros_diarios":
+                    cache_tabelas.invalidar("administracoes_medicamentos")
+            # Conta também as recusadas: o lote foi resolvido e a fila pode seguir
+            enviados += len(itens)
+
+        # Uma tabela com erro não impede o envio das outras
+        if falha:
+            raise falha
+        return enviados
+
+    def _enviar_partes(self, cliente, tabela, itens):
+        # Devolve os ids enviados. Um erro dos dados divide o lote ao meio até
+        # isolar as linhas recusadas; qualquer outro erro vale para o lote todo.
+        # As metades já enviadas voltam a ser enviadas se a outra metade falhar
+        # de outro jeito, o que a chave_idempotencia torna inofensivo.
+        try:
+            self._enviar_com_retentativas(cliente, tabela, [dados for _, dados in itens])
+            return [id_pendente for id_pendente, _ in itens]
+        except APIError as e:
+            if not erro_dos_dados(e):
+                raise
+            if len(itens) == 1:
+                self._registrar_recusa(itens[0][0], e)
+                return []
+        meio = len(itens) // 2
+        return self._enviar_partes(cliente, tabela, itens[:meio]) + self._enviar_partes(cliente, tabela, itens[meio:])
+
+    def _registrar_recusa(self, id_pendente, erro):
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                # recusado é calculado com o valor de tentativas de antes do update
+                "update pendentes set tentativas = tentativas + 1, erro = ?, recusado = tentativas + 1 >= ? where id = ?",
+                (str(erro), CAIXA_SAIDA_TENTATIVAS_MAXIMAS, id_pendente)
+            )
+
+    def _enviar_com_retentativas(self, cliente, tabela, linhas):
+        for tentativa in Retrying(
+            retry=retry_if_exception_type(httpx.TransportError),
+            wait=wait_exponential(multiplier=1, max=30),
+            stop=stop_after_attempt(4),
+            reraise=True,
+        ):
+            with tentativa:
+                self._enviar(cliente, tabela, linhas)
+
+    def _enviar(self, cliente, tabela, linhas):
+        if tabela == "registros_diarios":
+            # Registro + medicamentos administrados, tudo numa transação no banco
+            cliente.rpc("salvar_registros_diarios", {"registros": linhas}).execute()
+        else:
+            cliente.table(tabela).upsert(
+                linhas,
+                on_conflict="chave_idempotencia",
+                ignore_duplicates=True,
+                returning="minimal",
+            ).execute()
+
+@st.cache_resource
+def obter_caixa_saida():
+    return CaixaSaida(CAIXA_SAIDA_ARQUIVO)
+
+caixa_saida = obter_caixa_saida()
+caixa_saida.registrar_sessao(supabase, st.session_state["access_token"])
+
+def salvar(tabela, dados, descricao):
+    # descricao: o que foi salvo, para o aviso (ex.: "Registro diário")
+    caixa_saida.enfileirar(tabela, dict(dados, paciente_id=paciente_id), st.session_state["access_token"])
+    pendentes = caixa_saida.quantidade_pendente(usuario_id)
+    if pendentes:
+        # Ainda não chegou ao banco: aparece como pendente nas listas (ver exibir_pendentes)
+        st.info(f"💾 {descricao}: salvo neste aparelho, enviando ao servidor… ({pendentes} na fila)")
+    else:
+        st.success(f"✅ {descricao}: salvo no servidor.")
+
+def linhas_pendentes(nome):
+    # Linhas deste paciente ainda na caixa de saída, com o esquema da cópia
+    # local. O id fica negativo (o do banco só existe depois do envio) e
+    # created_at é a hora em que a linha foi salva neste aparelho.
+    linhas = [
+        {"created_at": pd.Timestamp(criado_em, unit="s", tz="UTC").isoformat(), **json.loads(dados), "id": -id_pendente}
+        for id_pendente, dados, criado_em in caixa_saida.pendentes(nome)
+    ]
+    linhas = [linha for linha in linhas if linha.get("paciente_id") == paciente_id]
+    return aplicar_esquema(nome, pd.DataFrame(linhas))
+
+def exibir_pendentes(nome, colunas):
+    # Mostra as linhas salvas e ainda não enviadas antes da lista do banco;
+    # depois do envio elas chegam pela sincronização e saem daqui
+    pendentes = linhas_pendentes(nome)
+    if pendentes.empty:
+        return
+    # Sem colunas (lista ainda vazia): tudo menos as colunas internas
+    colunas = list(colunas) or [c for c in pendentes.columns if c not in ("id", "paciente_id", "chave_idempotencia", "medicamento_ids")]
+    st.caption(f"⏳ {len(pendentes)} registro(s) salvos neste aparelho, aguardando envio:")
+    exibir_tabela(f"{nome} pendentes", pendentes.reindex(columns=colunas), hide_index=True)
+
+# 📡 Tempo real: cada usuário logado no processo tem a sua assinatura (com o
+# token dele), que recebe INSERT/UPDATE/DELETE das tabelas do app. As mudanças
+# vão para uma fila e uma thread as aplica na cópia local (ver EspelhoTabela),
+# sem consultar a API de novo. Enquanto a assinatura do usuário da sessão está
+# ativa e dando sinal de vida (um evento, ou a resposta do servidor a um sinal
+# mandado a cada TEMPO_REAL_SINAL_SEGUNDOS), a sincronização não busca nada; se
+# a conexão cair ou ficar muda, volta a buscar pela marca d'água. As telas
+# abertas percebem a mudança por um fragmento que só compara a versão de cada
+# tabela, sem ir à rede.
+TEMPO_REAL = os.getenv("TEMPO_REAL", "1") == "1"
+TEMPO_REAL_VERIFICACAO_SEGUNDOS = float(os.getenv("TEMPO_REAL_VERIFICACAO_SEGUNDOS", "2"))
+TEMPO_REAL_SINAL_SEGUNDOS = float(os.getenv("TEMPO_REAL_SINAL_SEGUNDOS", "15"))
+# Sem sinal de vida por mais que isto, a assinatura deixa de valer para em_dia
+TEMPO_REAL_SILENCIO_MAXIMO_SEGUNDOS = float(os.getenv("TEMPO_REAL_SILENCIO_MAXIMO_SEGUNDOS", "45"))
+TABELAS_TEMPO_REAL = [
+    "registros_diarios", "medicamentos", "alimentacao", "fisioterapia", "cuidadores", "administracoes_medicamentos"
+]
+
+class ConexaoTempoReal:
+    def __init__(self, token):
+        self.token = token
+        self.cliente = None
+        # Início da inscrição atual do canal; None enquanto está fora do ar
+        self.conectado_desde = None
+        # monotonic() do último evento ou resposta a um sinal
+        self.ultimo_sinal = None
+
+class TempoReal:
+    def __init__(self, url, chave):
+        self.url = url
+        self.chave = chave
+        # Chave: usuário (sub do token)
+        self.conexoes = {}
+        # Contador por (tabela, paciente_id); paciente None vale para todos os pacientes
+        self.versoes = {}
+        # Mudanças recebidas pelo laço de eventos, aplicadas nos espelhos pela thread tempo-real-espelhos
+        self.fila = queue.Queue()
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True, name="tempo-real").start()
+        threading.Thread(target=self._aplicar_mudancas, daemon=True, name="tempo-real-espelhos").start()
+
+    def em_dia(self, nome, espelho, usuario):
+        # Só vale a assinatura do usuário desta sessão: ela cobre as tabelas de
+        # TABELAS_TEMPO_REAL de todos os pacientes vinculados a ele (os únicos
+        # que a sessão pode abrir). A cópia está em dia se foi consultada depois
+        # que a inscrição começou e se a assinatura deu sinal de vida há pouco.
+        conexao = self.conexoes.get(usuario)
+        if conexao is None or nome not in TABELAS_TEMPO_REAL:
+            return False
+        conectado_desde, ultimo_sinal = conexao.conectado_desde, conexao.ultimo_sinal
+        return (
+            conectado_desde is not None
+            and espelho.sincronizado_em >= conectado_desde
+            and ultimo_sinal is not None
+            and monotonic() - ultimo_sinal <= TEMPO_REAL_SILENCIO_MAXIMO_SEGUNDOS
+        )
+
+    def versao(self, tabelas, paciente_id):
+        return tuple(
+            self.versoes.get((tabela, paciente_id), 0) + self.versoes.get((tabela, None), 0)
+            for tabela in tabelas
+        )
+
+    def definir_token(self, token):
+        # Com RLS, cada assinatura só recebe as linhas que o seu usuário pode ver
+        usuario = usuario_do_token(token)
+        if usuario is None:
+            return
+        with self._lock:
+            conexao = self.conexoes.get(usuario)
+            if conexao is None:
+                conexao = self.conexoes[usuario] = ConexaoTempoReal(token)
+                asyncio.run_coroutine_threadsafe(self._laco(usuario, conexao), self._loop)
+                return
+        if token != conexao.token:
+            conexao.token = token
+            cliente = conexao.cliente
+            if cliente is not None:
+                asyncio.run_coroutine_threadsafe(cliente.set_auth(token), self._loop)
+
+    async def _laco(self, usuario, conexao):
+        espera = 1
+        # Token vencido e não renovado: a sessão acabou e a assinatura do usuário também
+        while segundos_ate_expirar(conexao.token) > 0:
+            try:
+                await self._assinar(conexao)
+                espera = 1
+            except Exception:
+                pass
+            finally:
+                conexao.conectado_desde = None
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 60)
+        with self._lock:
+            if self.conexoes.get(usuario) is conexao:
+                del self.conexoes[usuario]
+
+    async def _assinar(self, conexao):
+        # A biblioteca refaz o websocket e inscreve o canal de novo quando a conexão cai
+        cliente = AsyncRealtimeClient(self.url, self.chave, auto_reconnect=True)
+        await cliente.set_auth(conexao.token)
+        await cliente.connect()
+        conexao.cliente = cliente
+        try:
+            # ack: o servidor responde a cada broadcast, o que serve de sinal de vida
+            canal = cliente.channel("cuidados", {"config": {
+                "broadcast": {"ack": True, "self": False}, "presence": {"key": ""}, "private": False,
+            }})
+            for tabela in TABELAS_TEMPO_REAL:
+                canal.on_postgres_changes("*", partial(self._ao_mudar, conexao, tabela), table=tabela, schema="public")
+            inscrito = asyncio.Event()
+
+            def ao_inscrever(status, erro):
+                # Chamado de novo a cada reinscrição depois de uma queda
+                if status == RealtimeSubscribeStates.SUBSCRIBED:
+                    conexao.conectado_desde = datetime.now().timestamp()
+                    conexao.ultimo_sinal = monotonic()
+                    inscrito.set()
+                else:
+                    conexao.conectado_desde = None
+
+            await canal.subscribe(ao_inscrever)
+            await asyncio.wait_for(inscrito.wait(), TEMPO_LIMITE_CONSULTA)
+            fora_do_ar_desde = None
+            sinal_enviado_em = monotonic()
+            while segundos_ate_expirar(conexao.token) > 0:
+                await asyncio.sleep(TEMPO_REAL_VERIFICACAO_SEGUNDOS)
+                if cliente.is_connected and canal.is_joined:
+                    fora_do_ar_desde = None
+                    if monotonic() - sinal_enviado_em >= TEMPO_REAL_SINAL_SEGUNDOS:
+                        sinal_enviado_em = monotonic()
+                        envio = await canal.push("broadcast", {"type": "broadcast", "event": "sinal", "payload": {}})
+                        envio.receive(RealtimeAcknowledgementStatus.Ok, partial(self._ao_receber_sinal, conexao))
+                    continue
+                # Até o canal ser inscrito de novo, as cópias voltam a consultar a API
+                conexao.conectado_desde = None
+                fora_do_ar_desde = fora_do_ar_desde or monotonic()
+                if monotonic() - fora_do_ar_desde > TEMPO_LIMITE_CONSULTA:
+                    # A biblioteca desistiu de reconectar: começa de novo com outro cliente
+                    raise ConnectionError("assinatura fora do ar")
+        finally:
+            conexao.cliente = None
+            await cliente.close()
+
+    def _ao_receber_sinal(self, conexao, resposta):
+        conexao.ultimo_sinal = monotonic()
+
+    def _ao_mudar(self, conexao, tabela, payload):
+        # Roda no laço de eventos: não espera pelos locks dos espelhos
+        conexao.ultimo_sinal = monotonic()
+        self.fila.put((tabela, payload["data"]))
+
+    def _aplicar_mudancas(self):
+        while True:
+            tabela, dados = self.fila.get()
+            linha, linha_antiga = dados.get("record"), dados.get("old_record")
+            # Um DELETE pode trazer só o id: aí a mudança vale para as cópias de todos os pacientes
+            paciente = (linha or linha_antiga or {}).get("paciente_id")
+            for (nome, paciente_espelho), espelho in espelhos.itens():
+                if nome != tabela or (paciente is not None and paciente_espelho != paciente):
+                    continue
+                with espelho.lock:
+                    if espelho.df is None:
+                        continue
+                    try:
+                        aplicar_mudanca(tabela, espelho, dados["type"], linha, linha_antiga)
+                    except Exception:
+                        # A cópia pode ter ficado pela metade: a próxima sincronização recarrega tudo
+                        espelho.carregado_em = 0.0
+            chave = (tabela, paciente)
+            self.versoes[chave] = self.versoes.get(chave, 0) + 1
+            cache_tabelas.invalidar(tabela, paciente)
+
+@st.cache_resource
+def obter_tempo_real():
+    return TempoReal(f"{supabase_url}/realtime/v1", supabase_key) if TEMPO_REAL else None
+
+tempo_real = obter_tempo_real()
+if tempo_real is not None:
+    tempo_real.definir_token(st.session_state["access_token"])
+
+@st.fragment(run_every=TEMPO_REAL_VERIFICACAO_SEGUNDOS)
+def acompanhar_mudancas(tabelas):
+    # Outro cuidador salvou algo numa tabela desta aba: roda a página de novo
+    atual = (tuple(tabelas), paciente_id, tempo_real.versao(tabelas, paciente_id))
+    anterior = st.session_state.get("versao_tempo_real")
+    st.session_state["versao_tempo_real"] = atual
+    if anterior is not None and anterior[:2] == atual[:2] and anterior[2] != atual[2]:
+        st.rerun()
+
+pendentes_envio = caixa_saida.quantidade_pendente()
+if pendentes_envio:
+    st.info(f"⏳ {pendentes_envio} registro(s) salvos neste aparelho aguardando envio ao servidor.")
+
+# ❌ Linhas que o banco recusou várias vezes: ficam fora da fila até alguém decidir
+recusados_envio = caixa_saida.recusados()
+if recusados_envio:
+    st.error(f"❌ {len(recusados_envio)} registro(s) recusados pelo servidor não foram salvos.")
+    with st.expander("Ver registros recusados"):
+        for id_pendente, tabela, dados, criado_em, erro in recusados_envio:
+            col1, col2, col3 = st.columns([6, 1, 1])
+            col1.markdown(f"**{tabela}** — salvo em {datetime.fromtimestamp(criado_em):%d/%m/%Y %H:%M}")
+            col1.caption(erro)
+            with col1.popover("Dados"):
+                st.json(json.loads(dados))
+            if col2.button("🔁 Reenviar", key=f"btn_reenviar_{id_pendente}"):
+                caixa_saida.reenviar(id_pendente)
+                st.rerun()
+            if col3.button("🗑️ Descartar", key=f"btn_descartar_{id_pendente}"):
+                caixa_saida.descartar(id_pendente)
+                st.rerun()
+
+# 👤 Paciente: consultas, caches e espelhos são todos separados por paciente,
+# então o custo de uma tela não cresce com o número de pacientes cadastrados.
+# Cada cuidador só vê os pacientes vinculados ao seu usuário (pacientes_usuarios).
+def buscar_pacientes(usuario_id):
+    vinculos = supabase.table("pacientes_usuarios").select("paciente_id").eq("usuario_id", usuario_id).execute()
+    ids = [v["paciente_id"] for v in vinculos.data]
+    if not ids:
+        return pd.DataFrame(columns=["id", "nome"])
+    response = supabase.table("pacientes").select("id", "nome").in_("id", ids).order("nome").execute()
+    return pd.DataFrame(response.data, columns=["id", "nome"])
+
+usuario_id = usuario_do_token(st.session_state["access_token"])
+try:
+    df_pacientes = consultar_com_cache(("pacientes", usuario_id), lambda: buscar_pacientes(usuario_id))
+except Exception as e:
+    st.error(f"Erro ao carregar 'pacientes': {e}")
+    st.stop()
+if df_pacientes.empty:
+    st.warning("Nenhum paciente vinculado ao seu usuário. Peça para vincular você a um paciente na tabela 'pacientes_usuarios' do Supabase.")
+    st.stop()
+nomes_pacientes = dict(zip(df_pacientes["id"].astype(int), df_pacientes["nome"]))
+if len(nomes_pacientes) > 1:
+    paciente_id = st.selectbox(
+        "👤 Paciente", list(nomes_pacientes), format_func=nomes_pacientes.get, key="selectbox_paciente"
+    )
+else:
+    paciente_id = next(iter(nomes_pacientes))
+paciente = nomes_pacientes[paciente_id]
+
+# 🗂️ Só a aba escolhida é montada, e cada aba busca apenas os dados que usa
+abas = ["📋 Registros Diários", "🧑‍⚕️ Cuidadores", "💊 Medicamentos", "🍽️ Alimentação", "🏃 Fisioterapia"]
+aba_selecionada = st.radio("Aba:", abas, horizontal=True, label_visibility="collapsed", key="radio_aba")
+inicio_aba = monotonic()
+tabelas_da_aba = {
+    abas[0]: ["registros_diarios", "cuidadores", "medicamentos"],
+    abas[1]: ["cuidadores"],
+    abas[2]: ["cuidadores", "medicamentos", "administracoes_medicamentos"],
+    abas[3]: ["cuidadores", "alimentacao"],
+    abas[4]: ["cuidadores", "fisioterapia"],
+}
+if tempo_real is not None:
+    acompanhar_mudancas(tabelas_da_aba[aba_selecionada])
 
 
 # 📋 REGISTROS DIÁRIOS
-with abas[0]:
+if aba_selecionada == abas[0]:
+    df_cuidadores, df_medicamentos = carregar_tabelas(
+        "cuidadores", "medicamentos",
+        extras={("registros_diarios", paciente_id): partial(sincronizar_tabela, "registros_diarios", paciente_id, usuario_id)}
+    )
+
     st.header("📋Registros Diários")
     st.markdown("Os registros diários de cuidados fica abaixo da página"
     "caso veja algum erro avise a Durval com prints.")
@@ -108,10 +2091,8 @@ with abas[0]:
     st.subheader("➕ Adicionar Novo Registro Diário")
 
     with st.form("form_registro_diario"):
-        paciente = "Fernando Paiva"
         st.markdown(f"👤 Paciente: **{paciente}**")
 
-        from datetime import datetime
         data = datetime.now().strftime("%Y-%m-%d")
         st.markdown(f"🕒 Data do Registro: **{data}**")
 
@@ -120,21 +2101,20 @@ with abas[0]:
         frequencia_cardiaca = st.number_input("Frequência Cardíaca (bpm)", min_value=30, max_value=200, step=1)
 
         # Eliminações intestinais
-        quant_feze = st.selectbox("Quantidade de evacuações (fezes) no dia", ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10"])
+        quant_feze = st.selectbox("Quantidade de evacuações (fezes) no dia", OPCOES_QUANTIDADE)
         caract_feze = st.selectbox(
             "Característica das fezes",
-            ["Normal (Fecaloma)", "Pastoso", "Diarreia"]
+            OPCOES_CARACTERISTICA_FEZE
         )
 
         # Eliminações vesicais
-        quant_urina = st.selectbox("Quantidade de micções (urina) no dia", ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10"])
+        quant_urina = st.selectbox("Quantidade de micções (urina) no dia", OPCOES_QUANTIDADE)
         aspecto_urina = st.selectbox(
             "Aspecto da urina",
-            ["Normal", "Escura", "Clara", "Com odor forte", "Com sangue", "Com pus", "Outro"]
+            OPCOES_ASPECTO_URINA
         )
 
-        opcoes_sono = [f"{h}h {m}min" if m > 0 else f"{h}h" for h in range(3, 13) for m in [0, 30]]
-        sono = st.selectbox("Horas de Sono", opcoes_sono)
+        sono = st.selectbox("Horas de Sono", OPCOES_SONO)
         pressao = st.text_input("Pressão Arterial (ex: 120x80)")
         observacao = st.text_area("Observação comportamental e de saúde do paciente")
         observacao_geral = st.text_area("Observação de entrada e saída do cuidador")
@@ -145,14 +2125,15 @@ with abas[0]:
             nomes_cuidadores = []
         cuidador = st.selectbox("Cuidador Responsável", nomes_cuidadores)
 
-        # 🔍 Buscar medicamentos disponíveis
-        df_medicamentos = supabase.table("medicamentos").select("id", "nome", "dosagem").execute().data
+        # 💊 Medicamentos disponíveis
         opcoes_medicamentos = {
-            f"{m['nome']} ({m['dosagem']})": m["id"] for m in df_medicamentos
+            f"{m['nome']} ({m['dosagem']})": m["id"]
+            for m in df_medicamentos.to_dict("records")
         }
         medicamentos_selecionados = st.multiselect(
             "Medicamentos administrados hoje",
-            options=list(opcoes_medicamentos.keys())
+            options=list(opcoes_medicamentos.keys()),
+            help="Não entram na agenda de doses: para cada dose, use \"Registrar dose agora\" na aba Medicamentos."
         )
 
         enviar = st.form_submit_button("Salvar Registro")
@@ -180,28 +2161,27 @@ with abas[0]:
                     "quantidade_urina": quant_urina,
                     "aspecto_urina": aspecto_urina
                 }
-                resultado = supabase.table("registros_diarios").insert(novo_registro).execute()
-                registro_id = resultado.data[0]["id"]
-
-                # 🔗 Atualizar medicamentos com o registro_id
-                for label in medicamentos_selecionados:
-                    medicamento_id = opcoes_medicamentos[label]
-                    supabase.table("medicamentos").update({"registro_id": registro_id}).eq("id", medicamento_id).execute()
-
-                st.success("✅ Registro diário salvo com sucesso e medicamentos vinculados!")
+                # 🔗 Registro e medicamentos administrados vão juntos para o banco
+                novo_registro["medicamento_ids"] = [opcoes_medicamentos[label] for label in medicamentos_selecionados]
+                # Hora em que o cuidador salvou, não a hora em que a caixa de saída conseguiu enviar
+                novo_registro["administrado_em"] = pd.Timestamp.now(tz="UTC").isoformat()
+                salvar("registros_diarios", novo_registro, "Registro diário com os medicamentos vinculados")
 
     # 🔍 Filtros dos registros diários
     st.divider()
     st.subheader("🔍 Filtros de Registros Diários")
 
-    if df_registros.empty:
+    colunas_ocultas = ["id", "created_at", "updated_at", "cuidador_id", "paciente_id", "chave_idempotencia"]
+    try:
+        colunas_espelho, contagens = facetas_registros()
+    except Exception as e:
+        st.error(f"Erro ao carregar 'registros_diarios': {e}")
+        colunas_espelho, contagens = [], {}
+    colunas_registros = [c for c in colunas_espelho if c not in colunas_ocultas]
+
+    if not colunas_registros:
         st.warning("⚠️ Nenhum dado encontrado na tabela 'registros_diarios'.")
     else:
-        # Remover colunas indesejadas para exibição
-        colunas_ocultas = ["id", "created_at", "cuidador_id"]
-        df_registros_visivel = df_registros.drop(columns=colunas_ocultas, errors="ignore")
-        colunas_registros = list(df_registros_visivel.columns)
-
         colunas_selecionadas = st.multiselect(
             "🔽 Colunas visíveis:",
             colunas_registros,
@@ -209,34 +2189,112 @@ with abas[0]:
             key="multiselect_colunas_visiveis"
         )
 
-        col1, col2 = st.columns(2)
-
-        col_filtro = col1.selectbox(
+        colunas_filtro = st.multiselect(
             "🎯 Filtrar por:",
-            colunas_registros,
-            key="selectbox_filtro_coluna"
+            [c for c in colunas_registros if c in contagens],
+            key="multiselect_filtro_colunas"
         )
 
-        valor_filtro = col2.selectbox(
-            "🧮 Valor:",
-            df_registros_visivel[col_filtro].unique(),
-            key="selectbox_valor_filtro"
-        )
+        # Um seletor de valores por coluna, cada valor com a quantidade de registros
+        filtros = {}
+        if colunas_filtro:
+            for coluna, col in zip(colunas_filtro, st.columns(len(colunas_filtro))):
+                valores = col.multiselect(
+                    f"🧮 {coluna}:",
+                    sorted(contagens[coluna]),
+                    format_func=lambda valor, c=contagens[coluna]: rotulo_faceta(valor, c[valor]),
+                    key=f"multiselect_valores_{coluna}"
+                )
+                if valores:
+                    filtros[coluna] = valores
 
-        col3, col4 = st.columns(2)
-        status_filtrar = col3.button("🔍 Filtrar", key="btn_filtrar")
-        status_limpar = col4.button("🔹 Limpar", key="btn_limpar")
+        periodo = st.date_input("📅 Período:", value=(), format="DD/MM/YYYY", key="date_input_periodo_registros")
+        periodo = tuple(periodo) if len(periodo) == 2 else None
 
-        # Exibição dos registros
-        if status_filtrar and col_filtro:
-            df_exibir = df_registros_visivel[df_registros_visivel[col_filtro] == valor_filtro]
-        else:
-            df_exibir = df_registros_visivel.copy()
+        st.button("🔹 Limpar", key="btn_limpar", on_click=limpar_filtros_registros)
+
+        # A página volta para a primeira quando o filtro muda
+        assinatura = (paciente_id, tuple((c, tuple(v)) for c, v in filtros.items()), periodo)
+        if st.session_state.get("assinatura_registros") != assinatura:
+            st.session_state["assinatura_registros"] = assinatura
+            st.session_state["pagina_registros"] = 0
+
+        try:
+            df_pagina, total, pagina = pagina_registros(filtros, periodo, st.session_state["pagina_registros"])
+        except Exception as e:
+            st.error(f"Erro ao carregar 'registros_diarios': {e}")
+            df_pagina, total, pagina = pd.DataFrame(), 0, 0
+        st.session_state["pagina_registros"] = pagina
+        total_paginas = max(1, -(-total // REGISTROS_POR_PAGINA))
+
+        col5, col6 = st.columns(2)
+        col5.button("⬅️ Anterior", key="btn_pagina_anterior", disabled=pagina == 0,
+                    on_click=mudar_pagina_registros, args=(-1,))
+        col6.button("Próxima ➡️", key="btn_pagina_proxima", disabled=pagina + 1 >= total_paginas,
+                    on_click=mudar_pagina_registros, args=(1,))
+        st.caption(f"Página {pagina + 1} de {total_paginas} — {total} registro(s)")
 
-        st.dataframe(df_exibir[colunas_selecionadas])
+        # Exibição dos registros (formatação da data só na hora de mostrar)
+        df_exibir = df_pagina.drop(columns=colunas_ocultas, errors="ignore")
+        if "data" in df_exibir.columns:
+            df_exibir["data"] = pd.to_datetime(df_exibir["data"]).dt.strftime("%d/%m/%Y")
+
+        exibir_pendentes("registros_diarios", colunas_selecionadas)
+        exibir_tabela("registros_diarios", df_exibir[[c for c in colunas_selecionadas if c in df_exibir.columns]])
+
+    # 📈 Tendências e alertas dos sinais vitais
+    st.divider()
+    st.subheader("📈 Tendências dos Sinais Vitais")
+
+    try:
+        analise = sinais_vitais_analisados()
+    except Exception as e:
+        st.error(f"Erro ao carregar 'registros_diarios': {e}")
+        analise = pd.DataFrame()
+
+    if analise.empty:
+        st.info("Ainda não há registros suficientes para mostrar tendências.")
+    else:
+        periodos = {"Últimos 30 dias": 30, "Últimos 90 dias": 90, "Último ano": 365, "Tudo": None}
+        periodo_tendencia = st.selectbox("Período:", list(periodos), key="selectbox_periodo_tendencias")
+        dias = periodos[periodo_tendencia]
+        if dias:
+            analise = analise[analise.index >= analise.index.max() - pd.Timedelta(days=dias - 1)]
+
+        alertas = alertas_sinais_vitais(analise)
+        if not alertas.empty:
+            st.warning(f"⚠️ {len(alertas)} alerta(s) de sinais vitais no período.")
+            alertas_exibir = alertas.copy()
+            alertas_exibir["dia"] = alertas_exibir["dia"].dt.strftime("%d/%m/%Y")
+            exibir_tabela("alertas", alertas_exibir, hide_index=True)
+
+        graficos = {
+            "🌡️ Temperatura (°C)": ["temperatura"],
+            "🫁 Saturação (%)": ["saturacao"],
+            "❤️ Frequência Cardíaca (bpm)": ["frequencia_cardiaca"],
+            "🩸 Pressão Arterial (mmHg)": ["sistolica", "diastolica"],
+        }
+        for titulo, sinais in graficos.items():
+            st.markdown(f"**{titulo}**")
+            grafico = pd.concat(
+                [analise["valor"][sinais], analise["media"][sinais].add_suffix(f" (média {JANELA_MEDIA_DIAS}d)")],
+                axis=1
+            )
+            st.line_chart(grafico)
+
+        st.markdown("**😴 Sono (horas)**")
+        st.bar_chart(analise["valor"]["sono_minutos"] / 60)
+
+        st.markdown("**🚻 Eliminações (média por dia, semana a semana)**")
+        semanal = medias_agregadas("registros_diarios", por="semana")
+        if dias:
+            semanal = semanal[semanal.index >= analise.index.min() - pd.Timedelta(days=6)]
+        st.bar_chart(semanal[["evacuacoes", "miccoes"]].rename(columns={"evacuacoes": "Evacuações", "miccoes": "Micções"}))
 
 # 🧑‍⚕️ CUIDADORES
-with abas[1]:
+elif aba_selecionada == abas[1]:
+    df_cuidadores = carregar_tabela("cuidadores")
+
     st.subheader("Cadastro de Cuidadores")
     st.markdown("faça o seu cadastro aqui por favor.")
 
@@ -244,7 +2302,7 @@ with abas[1]:
         nome = st.text_input("Nome do Cuidador")
         idade = st.number_input("Idade", min_value=18, max_value=100)
         telefone = st.text_input("Telefone")
-        especialidade = st.selectbox("Especialidade", ["Geral", "Técnico em Enfermagem", "Enfermeiro", "Cuidador", "Outro"])
+        especialidade = st.selectbox("Especialidade", OPCOES_ESPECIALIDADE)
         disponibilidade = st.slider("Disponibilidade Semanal de Plantão (em Dias)", 0, 4)
 
         submit = st.form_submit_button("Salvar Cuidador")
@@ -257,21 +2315,29 @@ with abas[1]:
                 "especialidade": especialidade,
                 "disponibilidade": disponibilidade
             }
-            supabase.table("cuidadores").insert(novo).execute()
-            st.success(f"Cuidador {nome} cadastrado com sucesso! 🎉")
+            salvar("cuidadores", novo, f"Cuidador {nome}")
 
     st.divider()
     st.subheader("Lista de Cuidadores Registrados")
+    exibir_pendentes("cuidadores", ["nome", "idade", "telefone", "especialidade", "disponibilidade"])
     if not df_cuidadores.empty:
         # Remover colunas indesejadas
-        colunas_ocultas_cuidadores = ["id", "created_at", "vinculo"]
+        colunas_ocultas_cuidadores = ["id", "created_at", "updated_at", "vinculo", "paciente_id", "chave_idempotencia"]
         df_cuidadores_visivel = df_cuidadores.drop(columns=colunas_ocultas_cuidadores, errors="ignore")
-        st.dataframe(df_cuidadores_visivel)
+        exibir_tabela("cuidadores", df_cuidadores_visivel)
     else:
         st.info("Nenhum cuidador cadastrado ainda.")
 
 # 💊 MEDICAMENTOS
-with abas[2]:
+elif aba_selecionada == abas[2]:
+    df_cuidadores, df_medicamentos, df_administracoes = carregar_tabelas(
+        "cuidadores", "medicamentos", "administracoes_medicamentos"
+    )
+    # Doses registradas e ainda não enviadas já contam na agenda e na adesão
+    doses_pendentes = linhas_pendentes("administracoes_medicamentos")
+    if not doses_pendentes.empty:
+        df_administracoes = pd.concat([df_administracoes, doses_pendentes], ignore_index=True)
+
     st.subheader("Registro de Medicamentos")
     st.markdown("os medicamentos são cadastrados aqui e inseridos no registro diário"
     " aqui voce pode consultar abaixo a lista de medicamentos cadastrados "
@@ -282,8 +2348,9 @@ with abas[2]:
             cuidador_nome = st.selectbox("Cuidador Responsável", df_cuidadores["nome"].tolist())
             nome_medicamento = st.text_input("Nome do Medicamento")
             dosagem = st.text_input("Dosagem")
-            frequencia = st.selectbox("Frequência", ["1x ao dia", "2x ao dia", "3x ao dia", "A cada 8h", "Sob demanda"])
+            frequencia = st.selectbox("Frequência", OPCOES_FREQUENCIA)
             horario = st.time_input("Horário de Administração", value=time(8, 0))
+            fim_prescricao = st.date_input("Usar até (deixe vazio se for contínuo)", value=None, format="DD/MM/YYYY")
             observacoes = st.text_area("Observações Adicionais")
 
             salvar_med = st.form_submit_button("Salvar Medicamento")
@@ -295,41 +2362,118 @@ with abas[2]:
                     "dosagem": dosagem,
                     "frequencia": frequencia,
                     "horario": horario.strftime("%H:%M"),
+                    "fim": fim_prescricao,
                     "cuidador_id": cuidador_id,
                     "observacoes": observacoes
                 }
-                supabase.table("medicamentos").insert(novo).execute()
-                st.success(f"Medicamento {nome_medicamento} registrado com sucesso! ✅")
+                salvar("medicamentos", novo, f"Medicamento {nome_medicamento}")
         else:
             st.warning("Cadastre pelo menos um cuidador para registrar medicamentos.")
 
     # 📊 Mostrar todos os medicamentos registrados
     st.markdown("### Medicamentos Registrados")
-    dados_medicamentos = supabase.table("medicamentos").select("*").execute()
-    
-    df_medicamentos = pd.DataFrame(dados_medicamentos.data)
+    df_medicamentos = carregar_tabela("medicamentos")
 
     # 🧹 Remover colunas indesejadas
-    colunas_ocultas_medicamentos = ["id", "cuidador_id", "created_at", "registro_id"]
+    colunas_ocultas_medicamentos = ["id", "cuidador_id", "created_at", "updated_at", "registro_id", "paciente_id", "chave_idempotencia"]
     df_medicamentos_visivel = df_medicamentos.drop(columns=colunas_ocultas_medicamentos, errors="ignore")
 
+    exibir_pendentes("medicamentos", df_medicamentos_visivel.columns)
     if not df_medicamentos_visivel.empty:
-        st.dataframe(df_medicamentos_visivel)
+        exibir_tabela("medicamentos", df_medicamentos_visivel)
     else:
         st.info("Nenhum medicamento registrado ainda.")
+
+    # ⏰ Doses do plantão atual, casadas com as administrações registradas
+    st.divider()
+    st.subheader("⏰ Doses do Plantão")
+    nomes_medicamentos = {}
+    if not df_medicamentos.empty:
+        nomes_medicamentos = dict(zip(
+            df_medicamentos["id"].astype(int),
+            df_medicamentos["nome"].astype(str) + " (" + df_medicamentos["dosagem"].astype(str) + ")"
+        ))
+    agora = agora_local()
+    inicio_plantao, fim_plantao = plantao_atual(agora)
+    st.caption(
+        f"Plantão de {inicio_plantao:%d/%m %H:%M} a {fim_plantao:%d/%m %H:%M}. "
+        f"Doses administradas até {TOLERANCIA_DOSE_MINUTOS} min depois do horário contam como no horário."
+    )
+    with medir("agenda do plantão", len(df_medicamentos)):
+        doses_plantao, avulsas_plantao = agenda_medicamentos(df_medicamentos, df_administracoes, inicio_plantao, fim_plantao, agora)
+    repetidas_plantao = avulsas_plantao[avulsas_plantao["repetida"]]
+    for medicamento_id, horas in repetidas_plantao.groupby("medicamento_id")["administrado_em"]:
+        st.error(
+            f"❗ Dose repetida de {nomes_medicamentos.get(medicamento_id, f'Medicamento {medicamento_id}')}: "
+            f"registrada de novo às {', '.join(horas.dt.strftime('%H:%M'))}, dentro da janela de uma dose já dada."
+        )
+    if doses_plantao.empty:
+        st.info("Nenhuma dose prevista neste plantão.")
+    else:
+        atrasadas = (doses_plantao["situacao"] == DOSE_ATRASADA).sum()
+        if atrasadas:
+            st.warning(f"⚠️ {atrasadas} dose(s) atrasada(s) neste plantão.")
+        exibir_tabela("doses do plantão", pd.DataFrame({
+            "Medicamento": doses_plantao["medicamento_id"].map(nomes_medicamentos),
+            "Previsto": doses_plantao["prevista"].dt.strftime("%d/%m %H:%M"),
+            "Situação": doses_plantao["situacao"],
+            "Administrado": doses_plantao["administrada_em"].dt.strftime("%H:%M").fillna("—"),
+        }), hide_index=True)
+
+    with st.form("form_registrar_dose"):
+        medicamento_dose = st.selectbox(
+            "Medicamento administrado", list(nomes_medicamentos), format_func=nomes_medicamentos.get
+        )
+        registrar_dose = st.form_submit_button("✅ Registrar dose agora")
+        if registrar_dose and medicamento_dose is not None:
+            salvar("administracoes_medicamentos", {
+                "medicamento_id": medicamento_dose,
+                "administrado_em": pd.Timestamp.now(tz="UTC").isoformat(),
+            }, f"Dose de {nomes_medicamentos[medicamento_dose]}")
+
+    # 📊 Adesão em qualquer período
+    st.divider()
+    st.subheader("📊 Adesão ao Tratamento")
+    periodo_adesao = st.date_input(
+        "📅 Período:", value=((agora - pd.Timedelta(days=29)).date(), agora.date()),
+        format="DD/MM/YYYY", key="date_input_periodo_adesao"
+    )
+    if len(periodo_adesao) == 2:
+        inicio_adesao = pd.Timestamp(periodo_adesao[0])
+        fim_adesao = pd.Timestamp(periodo_adesao[1]) + pd.Timedelta(days=1)
+        with medir("adesão", len(df_administracoes)):
+            doses_periodo, avulsas = agenda_medicamentos(df_medicamentos, df_administracoes, inicio_adesao, fim_adesao, agora)
+            adesao = adesao_medicamentos(doses_periodo, avulsas)
+        if adesao.empty:
+            st.info("Nenhuma dose prevista ou registrada no período.")
+        else:
+            administradas = adesao["No horário"].sum() + adesao["Com atraso"].sum()
+            if adesao["Previstas"].sum():
+                st.metric("Adesão no período", f"{100 * administradas / adesao['Previstas'].sum():.0f}%")
+            adesao.index = adesao.index.map(lambda i: nomes_medicamentos.get(i, f"Medicamento {i}"))
+            adesao.index.name = "Medicamento"
+            exibir_tabela("adesão", adesao.astype({c: int for c in ["No horário", "Com atraso", "Perdidas", "Previstas", "Fora da agenda", "Repetidas"]}))
+
+            encerradas = doses_periodo[doses_periodo["situacao"].isin([DOSE_NO_HORARIO, DOSE_COM_ATRASO, DOSE_PERDIDA])]
+            if not encerradas.empty:
+                st.markdown("**Adesão por dia (%)**")
+                por_dia = (encerradas["situacao"] != DOSE_PERDIDA).groupby(encerradas["prevista"].dt.normalize()).mean() * 100
+                st.line_chart(por_dia.rename("Adesão (%)"))
        
 
 # 🍽️ ALIMENTAÇÃO
-with abas[3]:
+elif aba_selecionada == abas[3]:
+    df_cuidadores, df_refeicoes = carregar_tabelas("cuidadores", "alimentacao")
+
     st.subheader("Registro de Refeições")
 
     with st.form("form_alimentacao"):
         if not df_cuidadores.empty and "nome" in df_cuidadores.columns:
             cuidador_nome = st.selectbox("Cuidador Responsável", df_cuidadores["nome"].tolist())
-            refeicao = st.selectbox("Tipo de Refeição", ["Café da Manhã", "Almoço", "Lanche", "Jantar", "Ceia"])
+            refeicao = st.selectbox("Tipo de Refeição", OPCOES_REFEICAO)
             alimentos = st.text_area("Alimentos Oferecidos")
             quantidade = st.text_input("Quantidade Aproximada")
-            aceitou = st.radio("Aceitação da refeição:", ["Sim", "Parcialmente", "Recusou"])
+            aceitou = st.radio("Aceitação da refeição:", OPCOES_ACEITACAO)
             horario = st.time_input("Horário da Refeição", value=time(12, 0))
             observacoes = st.text_area("Observações adicionais")
 
@@ -348,30 +2492,38 @@ with abas[3]:
                     "cuidador_id": cuidador_id,
                     "observacoes": observacoes
                 }
-                supabase.table("alimentacao").insert(novo).execute()
-                st.success(f"Refeição registrada: {refeicao} às {horario.strftime('%H:%M')} 🕒")
+                salvar("alimentacao", novo, f"Refeição {refeicao} às {horario.strftime('%H:%M')}")
         else:
             st.warning("Cadastre pelo menos um cuidador para registrar refeições.")
 
     # 📊 Mostrar todas as refeições registradas
     st.divider()
     st.subheader("Refeições Registradas")
-    dados_refeicoes = supabase.table("alimentacao").select("*").execute()
-    df_refeicoes = pd.DataFrame(dados_refeicoes.data)
+    df_refeicoes = carregar_tabela("alimentacao")
 
     # 🧹 Remover colunas indesejadas
-    colunas_ocultas_alimentacao = ["id", "cuidador_id"]
+    colunas_ocultas_alimentacao = ["id", "updated_at", "cuidador_id", "paciente_id", "chave_idempotencia"]
     df_refeicoes_visivel = df_refeicoes.drop(columns=colunas_ocultas_alimentacao, errors="ignore")
 
+    exibir_pendentes("alimentacao", df_refeicoes_visivel.columns)
     if not df_refeicoes_visivel.empty:
-        st.dataframe(df_refeicoes_visivel)
+        exibir_tabela("alimentacao", df_refeicoes_visivel)
+
+        # 📈 Aceitação por tipo de refeição, lida dos agregados (não das refeições)
+        st.markdown("### 📈 Aceitação das Refeições por Semana (%)")
+        try:
+            st.line_chart(medias_agregadas("alimentacao", por="semana") * 100)
+        except Exception as e:
+            st.error(f"Erro ao carregar 'alimentacao': {e}")
     else:
         st.info("Nenhum registro de alimentação ainda.")
 
 # 🏃 FISIOTERAPIA
-with abas[4]:
+elif aba_selecionada == abas[4]:
+    df_cuidadores, _ = carregar_tabelas("cuidadores", "fisioterapia")
+
     st.subheader("🏃 Registro de Fisioterapia")
-    st.markdown("Registre as sessões de fisioterapia de Fernando Paiva aqui.")
+    st.markdown(f"Registre as sessões de fisioterapia de {paciente} aqui.")
     
     with st.form("form_fisioterapia"):
         col1, col2 = st.columns(2)
@@ -401,24 +2553,19 @@ with abas[4]:
             grau_dor = st.slider("Grau de Dor (0-10)", min_value=0, max_value=10, value=0)
             
             # Força muscular
-            forca_muscular = st.selectbox("Força Muscular (Escala Oxford)", 
-                                        ["0 - Sem contração", "1 - Contração palpável", 
-                                         "2 - Movimento sem gravidade", "3 - Movimento contra gravidade", 
-                                         "4 - Movimento contra resistência leve", "5 - Força normal"])
+            forca_muscular = st.selectbox("Força Muscular (Escala Oxford)", OPCOES_FORCA_MUSCULAR)
             
             # Mobilidade articular
             amplitude_movimento = st.text_area("Amplitude de Movimento (ROM)", height=80)
             
             # Espasticidade
-            espasticidade = st.selectbox("Espasticidade/Tônus", 
-                                       ["Normal", "Leve", "Moderada", "Grave"])
+            espasticidade = st.selectbox("Espasticidade/Tônus", OPCOES_ESPASTICIDADE)
             
             # Capacidade funcional
             capacidade_funcional = st.text_area("Atividades de Vida Diária (AVDs)", height=80)
             
             st.markdown("### 📊 Quadro Geral")
-            estabilidade_motora = st.selectbox("Estabilidade Motora", 
-                                             ["Estável", "Melhora", "Declínio", "Instável"])
+            estabilidade_motora = st.selectbox("Estabilidade Motora", OPCOES_ESTABILIDADE_MOTORA)
             quadro_clinico = st.text_area("Quadro Clínico Motor", height=80)
         
         st.markdown("### 📋 Observações e Evolução")
@@ -466,40 +2613,142 @@ with abas[4]:
             }
             
             try:
-                supabase.table("fisioterapia").insert(novo_registro_fisio).execute()
-                st.success(f"✅ Registro de fisioterapia salvo com sucesso! Data: {data_sessao}")
+                salvar("fisioterapia", novo_registro_fisio, f"Registro de fisioterapia de {data_sessao:%d/%m/%Y}")
             except Exception as e:
                 st.error(f"Erro ao salvar registro: {e}")
     
     st.divider()
     st.subheader("📊 Histórico de Fisioterapia")
     
-    # Carregar dados reais da tabela fisioterapia
+    # Resumo (colunas curtas + prévia) da cópia local; o texto completo vem ao abrir uma sessão
     try:
-        dados_fisioterapia = supabase.table("fisioterapia").select("*").order("data_sessao", desc=True).execute()
-        df_fisioterapia = pd.DataFrame(dados_fisioterapia.data)
-        
-        if not df_fisioterapia.empty:
-            # Remover colunas indesejadas
-            colunas_ocultas_fisio = ["id", "cuidador_id", "created_at"]
-            df_fisioterapia_visivel = df_fisioterapia.drop(columns=colunas_ocultas_fisio, errors="ignore")
-            
-            # Formatar data para exibição
-            if "data_sessao" in df_fisioterapia_visivel.columns:
-                df_fisioterapia_visivel["data_sessao"] = pd.to_datetime(df_fisioterapia_visivel["data_sessao"]).dt.strftime("%d/%m/%Y")
-            
-            st.dataframe(df_fisioterapia_visivel)
-            
-            # Gráfico de evolução da dor se houver dados
-            if len(df_fisioterapia) > 1:
-                st.markdown("### 📈 Evolução do Grau de Dor")
-                df_dor = df_fisioterapia[["data_sessao", "grau_dor"]].copy()
-                df_dor["data_sessao"] = pd.to_datetime(df_dor["data_sessao"])
-                df_dor = df_dor.sort_values("data_sessao")
-                st.line_chart(df_dor.set_index("data_sessao"))
+        df_fisioterapia = resumo_fisioterapia()
+    except APIError as e:
+        # Só a falta da tabela vira o aviso; qualquer outro erro aparece como erro
+        if e.code in ("42P01", "PGRST205"):
+            st.warning("Tabela 'fisioterapia' não encontrada. Será criada automaticamente no primeiro registro.")
         else:
-            st.info("Nenhum registro de fisioterapia ainda.")
-            
+            st.error(f"Erro ao carregar 'fisioterapia': {e}")
+        df_fisioterapia = pd.DataFrame()
     except Exception as e:
-        st.warning(f"Tabela 'fisioterapia' não encontrada. Será criada automaticamente no primeiro registro.")
+        st.error(f"Erro ao carregar 'fisioterapia': {e}")
+        df_fisioterapia = pd.DataFrame()
+
+    exibir_pendentes("fisioterapia", COLUNAS_RESUMO_FISIOTERAPIA[1:-1])
+    if not df_fisioterapia.empty:
+        df_fisioterapia_visivel = df_fisioterapia.drop(columns=["id"], errors="ignore")
+        
+        # Formatar data para exibição
+        if "data_sessao" in df_fisioterapia_visivel.columns:
+            df_fisioterapia_visivel["data_sessao"] = pd.to_datetime(df_fisioterapia_visivel["data_sessao"]).dt.strftime("%d/%m/%Y")
+        
+        st.caption("Selecione uma sessão na tabela para ver o registro completo.")
+        selecao = exibir_tabela(
+            "fisioterapia",
+            df_fisioterapia_visivel,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="dataframe_historico_fisioterapia"
+        )
+        
+        linhas_selecionadas = selecao["selection"]["rows"]
+        if linhas_selecionadas:
+            sessao = df_fisioterapia.iloc[linhas_selecionadas[0]]
+            titulo = f"📄 Sessão de {df_fisioterapia_visivel.iloc[linhas_selecionadas[0]]['data_sessao']} — {sessao['fisioterapeuta']}"
+            with st.expander(titulo, expanded=True):
+                try:
+                    textos = texto_sessao_fisioterapia(int(sessao["id"]))
+                except Exception as e:
+                    st.error(f"Erro ao carregar a sessão: {e}")
+                    textos = {}
+                preenchidos = {campo: textos.get(campo) for campo in CAMPOS_TEXTO_FISIOTERAPIA if textos.get(campo)}
+                if preenchidos:
+                    for campo, texto in preenchidos.items():
+                        st.markdown(f"**{CAMPOS_TEXTO_FISIOTERAPIA[campo]}**")
+                        st.write(texto)
+                else:
+                    st.info("Nenhuma anotação nesta sessão.")
+    else:
+        st.info("Nenhum registro de fisioterapia ainda.")
+
+    # Gráfico de evolução da dor a partir dos agregados por dia/semana
+    agrupamento_dor = st.radio("Agrupar por:", ["dia", "semana"], horizontal=True, key="radio_agrupamento_dor")
+    try:
+        dor = medias_agregadas("fisioterapia", por=agrupamento_dor)["grau_dor"].dropna()
+    except Exception as e:
+        st.error(f"Erro ao carregar 'fisioterapia': {e}")
+        dor = pd.Series(dtype="float64")
+    if len(dor) > 1:
+        st.markdown("### 📈 Evolução do Grau de Dor")
+        st.line_chart(dor.rename("Grau de dor (média)"))
+
+# 📥 Exportar a tabela da aba ou o relatório clínico do período
+tabela_exportacao = {
+    abas[0]: "registros_diarios",
+    abas[1]: "cuidadores",
+    abas[2]: "medicamentos",
+    abas[3]: "alimentacao",
+    abas[4]: "fisioterapia",
+}[aba_selecionada]
+with st.expander("📥 Exportar dados"):
+    periodo_exportacao = st.date_input("📅 Período:", value=(), format="DD/MM/YYYY", key="date_input_periodo_exportacao")
+    periodo_exportacao = tuple(periodo_exportacao) if len(periodo_exportacao) == 2 else None
+    st.caption("Sem período, exporta o histórico completo.")
+    formatos = {
+        f"Tabela '{tabela_exportacao}' (CSV)": ("csv", "text/csv"),
+        f"Tabela '{tabela_exportacao}' (Parquet)": ("parquet", "application/vnd.apache.parquet"),
+        "Relatório clínico (HTML, para imprimir ou salvar em PDF)": ("html", "text/html"),
+    }
+    formato_exportacao = st.radio("Formato:", list(formatos), key="radio_formato_exportacao")
+    extensao, tipo_arquivo = formatos[formato_exportacao]
+
+    # O arquivo temporário só existe enquanto é gerado: o conteúdo vai uma vez
+    # para o botão de download desta execução e o arquivo é apagado em seguida.
+    # Nas próximas execuções o botão some (e nada é relido do disco).
+    if st.button("📦 Gerar arquivo", key="btn_gerar_exportacao"):
+        descritor, arquivo = tempfile.mkstemp(suffix=f".{extensao}", prefix="exportacao_")
+        os.close(descritor)
+        sufixo = f"{periodo_exportacao[0]:%Y%m%d}_{periodo_exportacao[1]:%Y%m%d}" if periodo_exportacao else "completo"
+        try:
+            with st.spinner("Gerando arquivo..."):
+                if extensao == "html":
+                    nome_arquivo = f"relatorio_paciente{paciente_id}_{sufixo}.html"
+                    Path(arquivo).write_text(relatorio_html(relatorio_clinico(periodo_exportacao), periodo_exportacao), encoding="utf-8")
+                    linhas = None
+                else:
+                    nome_arquivo = f"{tabela_exportacao}_paciente{paciente_id}_{sufixo}.{extensao}"
+                    linhas = exportar_tabela(tabela_exportacao, periodo_exportacao, extensao, arquivo)
+            conteudo = Path(arquivo).read_bytes() if extensao == "html" or linhas else None
+        except Exception as e:
+            st.error(f"Erro ao exportar: {e}")
+        else:
+            if conteudo is None:
+                st.warning("⚠️ Nenhum registro no período escolhido.")
+            else:
+                st.caption("Relatório clínico gerado." if linhas is None else f"{linhas} linha(s) exportada(s).")
+                # "ignore": baixar não roda a página de novo, então o botão continua na tela
+                st.download_button(
+                    f"⬇️ Baixar {nome_arquivo}", conteudo,
+                    file_name=nome_arquivo, mime=tipo_arquivo, key="btn_baixar_exportacao", on_click="ignore"
+                )
+        finally:
+            Path(arquivo).unlink(missing_ok=True)
+
+registrar_metrica(f"aba {aba_selecionada}", monotonic() - inicio_aba)
+registrar_metrica("execução completa", monotonic() - inicio_execucao)
+
+# 🛠️ Painel de desempenho, só para os e-mails em ADMIN_EMAILS
+def email_usuario():
+    usuario = st.session_state.get("usuario")
+    email = usuario.get("email") if isinstance(usuario, dict) else getattr(usuario, "email", None)
+    return (email or "").lower()
+
+if email_usuario() in ADMIN_EMAILS:
+    with st.expander("🛠️ Desempenho (admin)"):
+        st.caption("Tempos em ms por medida: chamadas ao Supabase, montagem de tabelas e blocos da página.")
+        st.markdown("**Esta sessão**")
+        st.dataframe(metricas_sessao.resumo(), hide_index=True)
+        st.markdown("**Processo (todas as sessões)**")
+        st.dataframe(metricas_processo.resumo(), hide_index=True)
 
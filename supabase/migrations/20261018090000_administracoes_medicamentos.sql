@@ -0,0 +1,51 @@
+-- Vínculo N:N entre registros diários e medicamentos administrados.
+-- Substitui a coluna medicamentos.registro_id, que só permitia um registro por medicamento.
+create table if not exists public.administracoes_medicamentos (
+    id bigint generated by default as identity primary key,
+    registro_id bigint not null references public.registros_diarios (id) on delete cascade,
+    medicamento_id bigint not null references public.medicamentos (id) on delete cascade,
+    administrado_em timestamptz not null default now(),
+    created_at timestamptz not null default now()
+);
+
+create index if not exists administracoes_medicamentos_registro_idx
+    on public.administracoes_medicamentos (registro_id);
+create index if not exists administracoes_medicamentos_medicamento_idx
+    on public.administracoes_medicamentos (medicamento_id, administrado_em);
+
+-- Preserva os vínculos antigos
+insert into public.administracoes_medicamentos (registro_id, medicamento_id, administrado_em)
+select m.registro_id, m.id, r.created_at
+from public.medicamentos m
+join public.registros_diarios r on r.id = m.registro_id
+where m.registro_id is not null;
+
+-- Registro diário + administrações numa única chamada (e numa única transação)
+create or replace function public.salvar_registro_diario(
+    registro jsonb,
+    medicamento_ids bigint[] default '{}'
+)
+returns bigint
+language plpgsql
+as $$
+declare
+    novo_id bigint;
+begin
+    insert into public.registros_diarios (
+        data, temperatura, saturacao, frequencia_cardiaca, pressao, sono,
+        observacao, cuidador, observacao_geral, quantidade_feze,
+        caracteristica_feze, quantidade_urina, aspecto_urina
+    )
+    select
+        r.data, r.temperatura, r.saturacao, r.frequencia_cardiaca, r.pressao, r.sono,
+        r.observacao, r.cuidador, r.observacao_geral, r.quantidade_feze,
+        r.caracteristica_feze, r.quantidade_urina, r.aspecto_urina
+    from jsonb_populate_record(null::public.registros_diarios, registro) as r
+    returning id into novo_id;
+
+    insert into public.administracoes_medicamentos (registro_id, medicamento_id)
+    select novo_id, unnest(coalesce(medicamento_ids, '{}'));
+
+    return novo_id;
+end;
+$$;
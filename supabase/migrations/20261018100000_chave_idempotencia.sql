@@ -0,0 +1,68 @@
+-- Chave de idempotência das linhas enviadas pela caixa de saída do app.
+-- Reenvios do mesmo item batem no índice único e são ignorados.
+alter table public.registros_diarios add column if not exists chave_idempotencia uuid;
+alter table public.cuidadores add column if not exists chave_idempotencia uuid;
+alter table public.medicamentos add column if not exists chave_idempotencia uuid;
+alter table public.alimentacao add column if not exists chave_idempotencia uuid;
+alter table public.fisioterapia add column if not exists chave_idempotencia uuid;
+
+create unique index if not exists registros_diarios_chave_idempotencia_idx
+    on public.registros_diarios (chave_idempotencia);
+create unique index if not exists cuidadores_chave_idempotencia_idx
+    on public.cuidadores (chave_idempotencia);
+create unique index if not exists medicamentos_chave_idempotencia_idx
+    on public.medicamentos (chave_idempotencia);
+create unique index if not exists alimentacao_chave_idempotencia_idx
+    on public.alimentacao (chave_idempotencia);
+create unique index if not exists fisioterapia_chave_idempotencia_idx
+    on public.fisioterapia (chave_idempotencia);
+
+-- Mesmo registro enviado duas vezes devolve o id do primeiro e não repete os vínculos
+create or replace function public.salvar_registro_diario(
+    registro jsonb,
+    medicamento_ids bigint[] default '{}'
+)
+returns bigint
+language plpgsql
+as $$
+declare
+    novo_id bigint;
+begin
+    insert into public.registros_diarios (
+        data, temperatura, saturacao, frequencia_cardiaca, pressao, sono,
+        observacao, cuidador, observacao_geral, quantidade_feze,
+        caracteristica_feze, quantidade_urina, aspecto_urina, chave_idempotencia
+    )
+    select
+        r.data, r.temperatura, r.saturacao, r.frequencia_cardiaca, r.pressao, r.sono,
+        r.observacao, r.cuidador, r.observacao_geral, r.quantidade_feze,
+        r.caracteristica_feze, r.quantidade_urina, r.aspecto_urina, r.chave_idempotencia
+    from jsonb_populate_record(null::public.registros_diarios, registro) as r
+    on conflict (chave_idempotencia) do nothing
+    returning id into novo_id;
+
+    if novo_id is null then
+        select id into novo_id
+        from public.registros_diarios
+        where chave_idempotencia = (registro ->> 'chave_idempotencia')::uuid;
+        return novo_id;
+    end if;
+
+    insert into public.administracoes_medicamentos (registro_id, medicamento_id)
+    select novo_id, unnest(coalesce(medicamento_ids, '{}'));
+
+    return novo_id;
+end;
+$$;
+
+-- Lote de registros da caixa de saída: cada item traz seus medicamento_ids
+create or replace function public.salvar_registros_diarios(registros jsonb)
+returns setof bigint
+language sql
+as $$
+    select public.salvar_registro_diario(
+        item - 'medicamento_ids',
+        array(select jsonb_array_elements_text(coalesce(item -> 'medicamento_ids', '[]'::jsonb))::bigint)
+    )
+    from jsonb_array_elements(registros) as item;
+$$;
@@ -0,0 +1,9 @@
+-- Publica as mudanças das tabelas do app para a assinatura em tempo real.
+-- Sem isso o Realtime não envia INSERT/UPDATE/DELETE e o app continua
+-- sincronizando pela marca d'água.
+alter publication supabase_realtime add table
+    public.registros_diarios,
+    public.medicamentos,
+    public.alimentacao,
+    public.fisioterapia,
+    public.cuidadores;
@@ -0,0 +1,21 @@
+-- Histórico de fisioterapia sem os textos longos: só as colunas curtas e uma
+-- prévia. O texto completo de uma sessão é buscado na tabela quando ela é aberta.
+create or replace view public.fisioterapia_resumo
+with (security_invoker = true)
+as
+select
+    id,
+    data_sessao,
+    fisioterapeuta,
+    grau_dor,
+    forca_muscular,
+    espasticidade,
+    estabilidade_motora,
+    left(
+        concat_ws(' | ', nullif(evolucao_tratamento, ''), nullif(exercicios, ''), nullif(quadro_clinico, '')),
+        120
+    ) as previa
+from public.fisioterapia;
+
+create index if not exists fisioterapia_data_sessao_idx
+    on public.fisioterapia (data_sessao desc);
@@ -0,0 +1,107 @@
+-- Vários pacientes na mesma instalação. Todas as tabelas do app passam a ter
+-- paciente_id e toda consulta do app filtra por ele; os índices compostos
+-- (paciente + data) deixam o custo de cada consulta independente do número
+-- de pacientes. Em cuidadores, cada linha é a escala de um cuidador num paciente.
+create table if not exists public.pacientes (
+    id bigint generated by default as identity primary key,
+    nome text not null,
+    created_at timestamptz not null default now()
+);
+
+-- Os dados que já existem são do primeiro paciente
+insert into public.pacientes (nome)
+select 'Fernando Paiva'
+where not exists (select 1 from public.pacientes);
+
+alter table public.registros_diarios add column if not exists paciente_id bigint references public.pacientes (id);
+alter table public.medicamentos add column if not exists paciente_id bigint references public.pacientes (id);
+alter table public.alimentacao add column if not exists paciente_id bigint references public.pacientes (id);
+alter table public.fisioterapia add column if not exists paciente_id bigint references public.pacientes (id);
+alter table public.cuidadores add column if not exists paciente_id bigint references public.pacientes (id);
+
+update public.registros_diarios set paciente_id = (select min(id) from public.pacientes) where paciente_id is null;
+update public.medicamentos set paciente_id = (select min(id) from public.pacientes) where paciente_id is null;
+update public.alimentacao set paciente_id = (select min(id) from public.pacientes) where paciente_id is null;
+update public.fisioterapia set paciente_id = (select min(id) from public.pacientes) where paciente_id is null;
+update public.cuidadores set paciente_id = (select min(id) from public.pacientes) where paciente_id is null;
+
+alter table public.registros_diarios alter column paciente_id set not null;
+alter table public.medicamentos alter column paciente_id set not null;
+alter table public.alimentacao alter column paciente_id set not null;
+alter table public.fisioterapia alter column paciente_id set not null;
+alter table public.cuidadores alter column paciente_id set not null;
+
+-- Paginação por (data, id) e sincronização pela marca d'água, sempre dentro do paciente
+create index if not exists registros_diarios_paciente_data_idx
+    on public.registros_diarios (paciente_id, data desc, id desc);
+create index if not exists registros_diarios_paciente_created_idx
+    on public.registros_diarios (paciente_id, created_at);
+create index if not exists fisioterapia_paciente_data_idx
+    on public.fisioterapia (paciente_id, data_sessao desc, id desc);
+create index if not exists fisioterapia_paciente_created_idx
+    on public.fisioterapia (paciente_id, created_at);
+create index if not exists alimentacao_paciente_created_idx
+    on public.alimentacao (paciente_id, created_at);
+create index if not exists medicamentos_paciente_created_idx
+    on public.medicamentos (paciente_id, created_at);
+create index if not exists cuidadores_paciente_created_idx
+    on public.cuidadores (paciente_id, created_at);
+
+-- O resumo da fisioterapia também é filtrado por paciente
+create or replace view public.fisioterapia_resumo
+with (security_invoker = true)
+as
+select
+    id,
+    data_sessao,
+    fisioterapeuta,
+    grau_dor,
+    forca_muscular,
+    espasticidade,
+    estabilidade_motora,
+    left(
+        concat_ws(' | ', nullif(evolucao_tratamento, ''), nullif(exercicios, ''), nullif(quadro_clinico, '')),
+        120
+    ) as previa,
+    paciente_id
+from public.fisioterapia;
+
+-- O registro diário gravado pela caixa de saída leva o paciente
+create or replace function public.salvar_registro_diario(
+    registro jsonb,
+    medicamento_ids bigint[] default '{}'
+)
+returns bigint
+language plpgsql
+as $$
+declare
+    novo_id bigint;
+begin
+    insert into public.registros_diarios (
+        data, temperatura, saturacao, frequencia_cardiaca, pressao, sono,
+        observacao, cuidador, observacao_geral, quantidade_feze,
+        caracteristica_feze, quantidade_urina, aspecto_urina, chave_idempotencia,
+        paciente_id
+    )
+    select
+        r.data, r.temperatura, r.saturacao, r.frequencia_cardiaca, r.pressao, r.sono,
+        r.observacao, r.cuidador, r.observacao_geral, r.quantidade_feze,
+        r.caracteristica_feze, r.quantidade_urina, r.aspecto_urina, r.chave_idempotencia,
+        r.paciente_id
+    from jsonb_populate_record(null::public.registros_diarios, registro) as r
+    on conflict (chave_idempotencia) do nothing
+    returning id into novo_id;
+
+    if novo_id is null then
+        select id into novo_id
+        from public.registros_diarios
+        where chave_idempotencia = (registro ->> 'chave_idempotencia')::uuid;
+        return novo_id;
+    end if;
+
+    insert into public.administracoes_medicamentos (registro_id, medicamento_id)
+    select novo_id, unnest(coalesce(medicamento_ids, '{}'));
+
+    return novo_id;
+end;
+$$;
@@ -0,0 +1,44 @@
+-- Agenda e adesão dos medicamentos. As doses também são registradas fora do
+-- registro diário (botão "Registrar dose" da aba de medicamentos), então
+-- registro_id passa a ser opcional. paciente_id e chave_idempotencia seguem o
+-- padrão das outras tabelas: cópia local por paciente e envio pela caixa de saída.
+alter table public.administracoes_medicamentos alter column registro_id drop not null;
+alter table public.administracoes_medicamentos add column if not exists paciente_id bigint references public.pacientes (id);
+alter table public.administracoes_medicamentos add column if not exists chave_idempotencia uuid;
+
+update public.administracoes_medicamentos a
+set paciente_id = m.paciente_id
+from public.medicamentos m
+where m.id = a.medicamento_id and a.paciente_id is null;
+
+-- As administrações gravadas por salvar_registro_diario herdam o paciente do medicamento
+create or replace function public.preencher_paciente_administracao()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.paciente_id is null then
+        select m.paciente_id into new.paciente_id
+        from public.medicamentos m
+        where m.id = new.medicamento_id;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists administracoes_medicamentos_paciente on public.administracoes_medicamentos;
+create trigger administracoes_medicamentos_paciente
+    before insert on public.administracoes_medicamentos
+    for each row execute function public.preencher_paciente_administracao();
+
+alter table public.administracoes_medicamentos alter column paciente_id set not null;
+
+create unique index if not exists administracoes_medicamentos_chave_idempotencia_idx
+    on public.administracoes_medicamentos (chave_idempotencia);
+-- Agenda de um período e sincronização pela marca d'água, dentro do paciente
+create index if not exists administracoes_medicamentos_paciente_idx
+    on public.administracoes_medicamentos (paciente_id, administrado_em);
+create index if not exists administracoes_medicamentos_paciente_created_idx
+    on public.administracoes_medicamentos (paciente_id, created_at);
+
+alter publication supabase_realtime add table public.administracoes_medicamentos;
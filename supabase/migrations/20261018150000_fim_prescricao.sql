@@ -0,0 +1,47 @@
+-- Fim das prescrições e hora real das doses do registro diário.
+-- medicamentos.fim é o último dia em que a prescrição tem doses previstas;
+-- ativo = false suspende a prescrição (sem doses previstas, histórico mantido).
+alter table public.medicamentos add column if not exists fim date;
+alter table public.medicamentos add column if not exists ativo boolean not null default true;
+
+-- As administrações do registro diário levam a hora em que o cuidador salvou
+-- (registro.administrado_em), não a hora em que a caixa de saída conseguiu enviar
+create or replace function public.salvar_registro_diario(
+    registro jsonb,
+    medicamento_ids bigint[] default '{}'
+)
+returns bigint
+language plpgsql
+as $$
+declare
+    novo_id bigint;
+begin
+    insert into public.registros_diarios (
+        data, temperatura, saturacao, frequencia_cardiaca, pressao, sono,
+        observacao, cuidador, observacao_geral, quantidade_feze,
+        caracteristica_feze, quantidade_urina, aspecto_urina, chave_idempotencia,
+        paciente_id
+    )
+    select
+        r.data, r.temperatura, r.saturacao, r.frequencia_cardiaca, r.pressao, r.sono,
+        r.observacao, r.cuidador, r.observacao_geral, r.quantidade_feze,
+        r.caracteristica_feze, r.quantidade_urina, r.aspecto_urina, r.chave_idempotencia,
+        r.paciente_id
+    from jsonb_populate_record(null::public.registros_diarios, registro) as r
+    on conflict (chave_idempotencia) do nothing
+    returning id into novo_id;
+
+    if novo_id is null then
+        select id into novo_id
+        from public.registros_diarios
+        where chave_idempotencia = (registro ->> 'chave_idempotencia')::uuid;
+        return novo_id;
+    end if;
+
+    insert into public.administracoes_medicamentos (registro_id, medicamento_id, administrado_em)
+    select novo_id, unnest(coalesce(medicamento_ids, '{}')),
+           coalesce((registro ->> 'administrado_em')::timestamptz, now());
+
+    return novo_id;
+end;
+$$;
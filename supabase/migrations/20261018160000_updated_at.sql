@@ -0,0 +1,73 @@
+-- Marca d'água da sincronização (ver sincronizar_tabela no app): sem updated_at
+-- a busca incremental usava created_at e nunca trazia as linhas alteradas.
+-- As linhas que já existem começam com updated_at = created_at; daí em diante
+-- o gatilho atualiza a coluna a cada update.
+create or replace function public.marcar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+alter table public.registros_diarios add column if not exists updated_at timestamptz;
+alter table public.medicamentos add column if not exists updated_at timestamptz;
+alter table public.alimentacao add column if not exists updated_at timestamptz;
+alter table public.fisioterapia add column if not exists updated_at timestamptz;
+alter table public.cuidadores add column if not exists updated_at timestamptz;
+alter table public.administracoes_medicamentos add column if not exists updated_at timestamptz;
+
+update public.registros_diarios set updated_at = created_at where updated_at is null;
+update public.medicamentos set updated_at = created_at where updated_at is null;
+update public.alimentacao set updated_at = created_at where updated_at is null;
+update public.fisioterapia set updated_at = created_at where updated_at is null;
+update public.cuidadores set updated_at = created_at where updated_at is null;
+update public.administracoes_medicamentos set updated_at = created_at where updated_at is null;
+
+alter table public.registros_diarios alter column updated_at set default now(), alter column updated_at set not null;
+alter table public.medicamentos alter column updated_at set default now(), alter column updated_at set not null;
+alter table public.alimentacao alter column updated_at set default now(), alter column updated_at set not null;
+alter table public.fisioterapia alter column updated_at set default now(), alter column updated_at set not null;
+alter table public.cuidadores alter column updated_at set default now(), alter column updated_at set not null;
+alter table public.administracoes_medicamentos alter column updated_at set default now(), alter column updated_at set not null;
+
+drop trigger if exists registros_diarios_updated_at on public.registros_diarios;
+create trigger registros_diarios_updated_at
+    before update on public.registros_diarios
+    for each row execute function public.marcar_updated_at();
+drop trigger if exists medicamentos_updated_at on public.medicamentos;
+create trigger medicamentos_updated_at
+    before update on public.medicamentos
+    for each row execute function public.marcar_updated_at();
+drop trigger if exists alimentacao_updated_at on public.alimentacao;
+create trigger alimentacao_updated_at
+    before update on public.alimentacao
+    for each row execute function public.marcar_updated_at();
+drop trigger if exists fisioterapia_updated_at on public.fisioterapia;
+create trigger fisioterapia_updated_at
+    before update on public.fisioterapia
+    for each row execute function public.marcar_updated_at();
+drop trigger if exists cuidadores_updated_at on public.cuidadores;
+create trigger cuidadores_updated_at
+    before update on public.cuidadores
+    for each row execute function public.marcar_updated_at();
+drop trigger if exists administracoes_medicamentos_updated_at on public.administracoes_medicamentos;
+create trigger administracoes_medicamentos_updated_at
+    before update on public.administracoes_medicamentos
+    for each row execute function public.marcar_updated_at();
+
+-- Busca incremental: paciente_id = ? and updated_at >= marca
+create index if not exists registros_diarios_paciente_updated_idx
+    on public.registros_diarios (paciente_id, updated_at);
+create index if not exists medicamentos_paciente_updated_idx
+    on public.medicamentos (paciente_id, updated_at);
+create index if not exists alimentacao_paciente_updated_idx
+    on public.alimentacao (paciente_id, updated_at);
+create index if not exists fisioterapia_paciente_updated_idx
+    on public.fisioterapia (paciente_id, updated_at);
+create index if not exists cuidadores_paciente_updated_idx
+    on public.cuidadores (paciente_id, updated_at);
+create index if not exists administracoes_medicamentos_paciente_updated_idx
+    on public.administracoes_medicamentos (paciente_id, updated_at);
@@ -0,0 +1,36 @@
+-- Cada cuidador vê só os pacientes vinculados ao seu usuário. Os usuários que
+-- já existem ficam vinculados a todos os pacientes de hoje (é o acesso que já
+-- tinham); pacientes e usuários novos são vinculados aqui, pelo Supabase.
+-- A RLS das tabelas de dados (registros_diarios etc.) está em
+-- 20261018180000_rls_por_paciente.sql.
+create table if not exists public.pacientes_usuarios (
+    id bigint generated by default as identity primary key,
+    paciente_id bigint not null references public.pacientes (id) on delete cascade,
+    usuario_id uuid not null references auth.users (id) on delete cascade,
+    created_at timestamptz not null default now(),
+    unique (paciente_id, usuario_id)
+);
+
+create index if not exists pacientes_usuarios_usuario_idx
+    on public.pacientes_usuarios (usuario_id);
+
+insert into public.pacientes_usuarios (paciente_id, usuario_id)
+select p.id, u.id
+from public.pacientes p
+cross join auth.users u
+on conflict do nothing;
+
+alter table public.pacientes_usuarios enable row level security;
+drop policy if exists pacientes_usuarios_proprios on public.pacientes_usuarios;
+create policy pacientes_usuarios_proprios on public.pacientes_usuarios
+    for select to authenticated
+    using (usuario_id = auth.uid());
+
+alter table public.pacientes enable row level security;
+drop policy if exists pacientes_vinculados on public.pacientes;
+create policy pacientes_vinculados on public.pacientes
+    for select to authenticated
+    using (exists (
+        select 1 from public.pacientes_usuarios v
+        where v.paciente_id = pacientes.id and v.usuario_id = auth.uid()
+    ));
@@ -0,0 +1,137 @@
+-- Proteção no banco das tabelas de dados: cada usuário só lê e grava as linhas
+-- dos pacientes vinculados a ele em pacientes_usuarios. Vale também para o
+-- tempo real (o Realtime aplica a RLS antes de mandar cada mudança) e para a
+-- view fisioterapia_resumo, que é security_invoker.
+-- Não existe tabela sinais_vitais neste esquema: os sinais vitais ficam em
+-- registros_diarios.
+alter table public.registros_diarios enable row level security;
+drop policy if exists registros_diarios_vinculados on public.registros_diarios;
+create policy registros_diarios_vinculados on public.registros_diarios
+    for all to authenticated
+    using (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = registros_diarios.paciente_id and pu.usuario_id = auth.uid()
+    ))
+    with check (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = registros_diarios.paciente_id and pu.usuario_id = auth.uid()
+    ));
+
+alter table public.medicamentos enable row level security;
+drop policy if exists medicamentos_vinculados on public.medicamentos;
+create policy medicamentos_vinculados on public.medicamentos
+    for all to authenticated
+    using (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = medicamentos.paciente_id and pu.usuario_id = auth.uid()
+    ))
+    with check (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = medicamentos.paciente_id and pu.usuario_id = auth.uid()
+    ));
+
+alter table public.alimentacao enable row level security;
+drop policy if exists alimentacao_vinculados on public.alimentacao;
+create policy alimentacao_vinculados on public.alimentacao
+    for all to authenticated
+    using (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = alimentacao.paciente_id and pu.usuario_id = auth.uid()
+    ))
+    with check (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = alimentacao.paciente_id and pu.usuario_id = auth.uid()
+    ));
+
+alter table public.fisioterapia enable row level security;
+drop policy if exists fisioterapia_vinculados on public.fisioterapia;
+create policy fisioterapia_vinculados on public.fisioterapia
+    for all to authenticated
+    using (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = fisioterapia.paciente_id and pu.usuario_id = auth.uid()
+    ))
+    with check (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = fisioterapia.paciente_id and pu.usuario_id = auth.uid()
+    ));
+
+alter table public.cuidadores enable row level security;
+drop policy if exists cuidadores_vinculados on public.cuidadores;
+create policy cuidadores_vinculados on public.cuidadores
+    for all to authenticated
+    using (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = cuidadores.paciente_id and pu.usuario_id = auth.uid()
+    ))
+    with check (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = cuidadores.paciente_id and pu.usuario_id = auth.uid()
+    ));
+
+alter table public.administracoes_medicamentos enable row level security;
+drop policy if exists administracoes_medicamentos_vinculados on public.administracoes_medicamentos;
+create policy administracoes_medicamentos_vinculados on public.administracoes_medicamentos
+    for all to authenticated
+    using (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = administracoes_medicamentos.paciente_id and pu.usuario_id = auth.uid()
+    ))
+    with check (exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = administracoes_medicamentos.paciente_id and pu.usuario_id = auth.uid()
+    ));
+
+-- As RPCs rodam com os direitos de quem chama, então a RLS acima já vale
+-- dentro delas; a checagem explícita devolve um erro claro (42501, o mesmo da
+-- RLS, que a caixa de saída trata como falta de permissão do lote inteiro)
+-- antes de qualquer insert. salvar_registros_diarios chama esta função para
+-- cada item e herda a checagem.
+create or replace function public.salvar_registro_diario(
+    registro jsonb,
+    medicamento_ids bigint[] default '{}'
+)
+returns bigint
+language plpgsql
+security invoker
+as $$
+declare
+    novo_id bigint;
+begin
+    if not exists (
+        select 1 from public.pacientes_usuarios pu
+        where pu.paciente_id = (registro ->> 'paciente_id')::bigint and pu.usuario_id = auth.uid()
+    ) then
+        raise exception 'paciente % não vinculado ao usuário', registro ->> 'paciente_id'
+            using errcode = '42501';
+    end if;
+
+    insert into public.registros_diarios (
+        data, temperatura, saturacao, frequencia_cardiaca, pressao, sono,
+        observacao, cuidador, observacao_geral, quantidade_feze,
+        caracteristica_feze, quantidade_urina, aspecto_urina, chave_idempotencia,
+        paciente_id
+    )
+    select
+        r.data, r.temperatura, r.saturacao, r.frequencia_cardiaca, r.pressao, r.sono,
+        r.observacao, r.cuidador, r.observacao_geral, r.quantidade_feze,
+        r.caracteristica_feze, r.quantidade_urina, r.aspecto_urina, r.chave_idempotencia,
+        r.paciente_id
+    from jsonb_populate_record(null::public.registros_diarios, registro) as r
+    on conflict (chave_idempotencia) do nothing
+    returning id into novo_id;
+
+    if novo_id is null then
+        select id into novo_id
+        from public.registros_diarios
+        where chave_idempotencia = (registro ->> 'chave_idempotencia')::uuid;
+        return novo_id;
+    end if;
+
+    insert into public.administracoes_medicamentos (registro_id, medicamento_id, administrado_em)
+    select novo_id, unnest(coalesce(medicamento_ids, '{}')),
+           coalesce((registro ->> 'administrado_em')::timestamptz, now());
+
+    return novo_id;
+end;
+$$;
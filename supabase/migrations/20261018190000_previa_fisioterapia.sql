@@ -0,0 +1,43 @@
+-- Prévia do histórico de fisioterapia como coluna da tabela, preenchida por
+-- gatilho: a cópia local do app guarda a prévia junto das colunas curtas e
+-- monta o histórico sem baixar a view fisioterapia_resumo inteira; insert,
+-- update e tempo real já trazem a prévia de cada linha.
+alter table public.fisioterapia add column if not exists previa text;
+
+create or replace function public.preencher_previa_fisioterapia()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.previa = left(
+        concat_ws(' | ', nullif(new.evolucao_tratamento, ''), nullif(new.exercicios, ''), nullif(new.quadro_clinico, '')),
+        120
+    );
+    return new;
+end;
+$$;
+
+drop trigger if exists fisioterapia_previa on public.fisioterapia;
+create trigger fisioterapia_previa
+    before insert or update on public.fisioterapia
+    for each row execute function public.preencher_previa_fisioterapia();
+
+-- Preenche as linhas que já existem (quem calcula é o gatilho acima). O update
+-- também passa pelo gatilho de updated_at, então as cópias locais que já
+-- existem recebem a prévia na próxima busca incremental.
+update public.fisioterapia set previa = null where previa is null;
+
+create or replace view public.fisioterapia_resumo
+with (security_invoker = true)
+as
+select
+    id,
+    data_sessao,
+    fisioterapeuta,
+    grau_dor,
+    forca_muscular,
+    espasticidade,
+    estabilidade_motora,
+    previa,
+    paciente_id
+from public.fisioterapia;